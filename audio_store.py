@@ -0,0 +1,88 @@
+"""Decode-once store of 16 kHz mono float32 audio, read back through memory maps"""
+import os
+import hashlib
+import subprocess
+import tempfile
+
+import numpy as np
+
+from lru import HitCounter, evict_lru, touch
+
+SAMPLE_RATE = 16000
+
+DEFAULT_STORE_DIR = os.path.join("cache", "audio")
+# Size limit for decoded audio, override with TRANSCRIBER_AUDIO_STORE_MB
+DEFAULT_STORE_MB = int(os.environ.get("TRANSCRIBER_AUDIO_STORE_MB", "4096"))
+
+
+def open_pcm(path):
+    """Copy-on-write memory map of a raw float32 PCM file.
+
+    Pages are shared with the file (and other processes mapping it) until
+    written to, which Whisper never does; copy-on-write rather than read-only
+    keeps torch.from_numpy from warning about non-writable arrays.
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="c")
+
+
+def decode_to_file(file_path, pcm_path):
+    """Decode any ffmpeg-readable input straight to a raw float32 PCM file"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-threads", "0",
+        "-i", file_path,
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-y", pcm_path,
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except OSError as e:
+        raise Exception(f"Failed to start ffmpeg: {str(e)}")
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Failed to load audio: {e.stderr.decode(errors='replace').strip()}")
+
+
+class AudioStore(HitCounter):
+    """Keeps decoded audio on disk so every later pass (another model,
+    language, translation, VAD or chunking) maps it instead of running
+    ffmpeg again.
+
+    Entries are keyed on the input's path, size and modification time and
+    evicted least recently used once the store exceeds its size limit.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_mb=DEFAULT_STORE_MB):
+        self.store_dir = store_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def path_for(self, file_path):
+        stat = os.stat(file_path)
+        ident = f"{os.path.realpath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = hashlib.sha256(ident.encode("utf-8")).hexdigest()
+        return os.path.join(self.store_dir, f"{key}.f32")
+
+    def load(self, file_path):
+        """Decoded audio of file_path as a float32 memory map"""
+        pcm_path = self.path_for(file_path)
+        if os.path.exists(pcm_path):
+            self.count_lookup(True)
+            touch(pcm_path)
+        else:
+            self.count_lookup(False)
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                decode_to_file(file_path, tmp_path)
+                os.replace(tmp_path, pcm_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self.evict(keep=pcm_path)
+        return open_pcm(pcm_path)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until under the size limit"""
+        evict_lru(self.store_dir, ".f32", self.max_bytes, keep=[keep] if keep else ())
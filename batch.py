@@ -0,0 +1,439 @@
+"""Headless batch transcription across a pool of worker processes"""
+import os
+import sys
+import time
+import queue as queue_module
+import multiprocessing
+from pathlib import Path
+
+import transcriber
+import chunking
+import export
+import search
+import downloads
+from cache import TranscriptCache
+from audio_store import AudioStore
+from langid import LanguageDetector
+from vad import format_speedup
+from metrics import metrics
+
+# Per-process state, set up once by _init_worker
+_worker_model = None
+_worker_model_size = None
+_worker_options = None
+_worker_cache = None
+_worker_store = None
+_worker_detector = None
+
+
+def collect_inputs(sources):
+    """Expand directories and list files into a flat list of media paths.
+
+    Each source may be a media file, a YouTube URL, a directory (searched
+    recursively) or a .txt/.lst file with one path or URL per line.
+    """
+    files = []
+    for source in sources:
+        path = Path(source)
+        if downloads.is_url(source):
+            files.append(source)
+        elif path.is_dir():
+            for candidate in sorted(path.rglob("*")):
+                if candidate.is_file() and candidate.suffix.lower() in transcriber.MEDIA_EXTENSIONS:
+                    files.append(str(candidate))
+        elif path.suffix.lower() in (".txt", ".lst"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        files.append(line if downloads.is_url(line) else os.path.normpath(line))
+        elif path.is_file():
+            files.append(str(path))
+        else:
+            raise Exception(f"Input not found: {source}")
+    return files
+
+
+def _init_worker(model_size, options, threads):
+    global _worker_model_size, _worker_options, _worker_cache, _worker_store, _worker_detector
+    import torch
+    torch.set_num_threads(threads)
+    # The log path reaches workers through the environment; without one
+    # metrics still have to be switched on to be sent back with results
+    if options["metrics"] and not metrics.enabled:
+        metrics.configure()
+    _worker_model_size = model_size
+    _worker_options = options
+    if options["use_cache"]:
+        _worker_cache = TranscriptCache()
+        metrics.register("transcript_cache", _worker_cache.stats)
+    _worker_store = AudioStore()
+    metrics.register("audio_store", _worker_store.stats)
+    if options["language"] is None:
+        _worker_detector = LanguageDetector(store=_worker_store)
+        metrics.register("language_cache", _worker_detector.cache.stats)
+
+
+def _get_worker_model():
+    # Loaded on first cache miss so fully cached batches never load a model
+    global _worker_model
+    if _worker_model is None:
+        _worker_model = transcriber.load_model(_worker_model_size)
+    return _worker_model
+
+
+def _transcribe_one(job):
+    source, file_path, title, error = job
+    start = time.time()
+    try:
+        if error:
+            raise Exception(error)
+        result = transcriber.transcribe_cached(
+            _get_worker_model, file_path, _worker_model_size,
+            language=_worker_options["language"],
+            translate=_worker_options["translate"],
+            cache=_worker_cache,
+            vad=_worker_options["vad"],
+            store=_worker_store,
+            detector=_worker_detector,
+        )
+        output_file = _save(result, title, _worker_options["output_dir"],
+                            _worker_options["formats"], _worker_options["timestamps"])
+        item = {
+            "file": source,
+            "output": output_file,
+            "duration": result["duration"],
+            "speech_duration": result.get("speech_duration"),
+            "elapsed": time.time() - start,
+            "error": None,
+        }
+    except Exception as e:
+        item = {
+            "file": source,
+            "output": None,
+            "duration": 0.0,
+            "speech_duration": None,
+            "elapsed": time.time() - start,
+            "error": str(e),
+        }
+    # This worker's spans and cache stats, merged into the parent's metrics
+    item["metrics"] = metrics.drain() if metrics.enabled else None
+    return item
+
+
+def run_batch(files, model_size="base", language=None, translate=False, timestamps=False,
+              workers=None, output_dir="output", use_cache=True, vad=False, prefetch=2,
+              formats=("txt",), report=print):
+    """Transcribe files with `workers` processes, each holding its own model.
+
+    URLs among files are downloaded (or taken from the download cache) up to
+    `prefetch` ahead while earlier files are transcribed. At most `workers`
+    files are handed to the pool at a time, so downloads never run further
+    ahead than that. Returns the list of per-file result dicts in completion
+    order.
+    """
+    if workers is None:
+        workers = max(1, min(len(files), os.cpu_count() or 1))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    options = {
+        "language": language,
+        "translate": translate,
+        "timestamps": timestamps,
+        "output_dir": output_dir,
+        "use_cache": use_cache,
+        "vad": vad,
+        "formats": formats,
+        "metrics": metrics.enabled,
+    }
+
+    report(f"Transcribing {len(files)} file(s) with {workers} worker(s), "
+           f"{threads} thread(s) each, model '{model_size}'")
+
+    results = []
+    batch_start = time.time()
+    queue = downloads.DownloadQueue(downloads.DownloadCache(), prefetch)
+    _register_stats(queue)
+    # Use spawn so every worker gets a clean torch runtime
+    ctx = multiprocessing.get_context("spawn")
+    finished = queue_module.Queue()
+
+    def collect():
+        item = finished.get()
+        metrics.merge(item.pop("metrics", None))
+        queue.release(item["file"])
+        results.append(item)
+        _report_item(item, len(results), len(files), report)
+
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(model_size, options, threads)) as pool:
+        # Pulling the next input only when a worker is free keeps prefetching
+        # bounded, and any time spent waiting for its download is real idle time
+        in_flight = 0
+        for job in queue.iter_inputs(files):
+            while in_flight >= workers:
+                collect()
+                in_flight -= 1
+            pool.apply_async(_transcribe_one, (job,), callback=finished.put,
+                             error_callback=lambda e, source=job[0]: finished.put(
+                                 _failed_item(source, e)))
+            in_flight += 1
+        while in_flight:
+            collect()
+            in_flight -= 1
+
+    _report_summary(results, time.time() - batch_start, report)
+    if queue.urls:
+        report(queue.format_stats())
+    return results
+
+
+def _failed_item(source, error):
+    return {"file": source, "output": None, "duration": 0.0, "speech_duration": None,
+            "elapsed": 0.0, "error": str(error)}
+
+
+def run_chunked(files, model_size="base", language=None, translate=False, timestamps=False,
+                workers=None, output_dir="output", use_cache=True,
+                chunk_seconds=chunking.DEFAULT_CHUNK_SECONDS, prefetch=2, formats=("txt",),
+                report=print):
+    """Transcribe files one after another, splitting each into chunks that
+    are spread over `workers` processes. Suits a few very long files."""
+    cache = TranscriptCache() if use_cache else None
+    store = AudioStore()
+    queue = downloads.DownloadQueue(downloads.DownloadCache(), prefetch)
+    _register_stats(queue, cache, store)
+
+    results = []
+    batch_start = time.time()
+    with chunking.ChunkedTranscriber(model_size, workers, chunk_seconds, store=store) as pool:
+        report(f"Transcribing {len(files)} file(s) in {chunk_seconds}s chunks with "
+               f"{pool.workers} worker(s), model '{model_size}'")
+        for source, file_path, title, error in queue.iter_inputs(files):
+            start = time.time()
+            item = {"file": source, "output": None, "duration": 0.0,
+                    "speech_duration": None, "error": None}
+            try:
+                if error:
+                    raise Exception(error)
+                with metrics.span("transcribe", chunked=True):
+                    result = pool.transcribe_file(file_path, language, translate, cache)
+                item["output"] = _save(result, title, output_dir, formats, timestamps)
+                item["duration"] = result["duration"]
+            except Exception as e:
+                item["error"] = str(e)
+            item["elapsed"] = time.time() - start
+            queue.release(source)
+            results.append(item)
+            _report_item(item, len(results), len(files), report)
+
+    _report_summary(results, time.time() - batch_start, report)
+    if queue.urls:
+        report(queue.format_stats())
+    return results
+
+
+def run_batched(files, model_size="base", language=None, translate=False, timestamps=False,
+                batch_size=8, output_dir="output", use_cache=True, vad=False, prefetch=2,
+                formats=("txt",), report=print):
+    """Transcribe files in this process with one model, decoding up to
+    batch_size 30-second windows per forward pass. Windows of consecutive
+    files share batches, so many short files batch as well as one long one."""
+    import batched
+    cache = TranscriptCache() if use_cache else None
+    store = AudioStore()
+    queue = downloads.DownloadQueue(downloads.DownloadCache(), prefetch)
+    _register_stats(queue, cache, store)
+    task = "translate" if translate else "transcribe"
+    model = None
+
+    report(f"Transcribing {len(files)} file(s) in batches of {batch_size} windows, "
+           f"model '{model_size}'")
+
+    results = []
+    batch_start = time.time()
+    inputs = queue.iter_inputs(files)
+    while True:
+        group = []
+        for job in inputs:
+            group.append(job)
+            if len(group) == batch_size:
+                break
+        if not group:
+            break
+
+        start = time.time()
+        items = []
+        pending = []  # (item, title, key, audio, duration, timeline)
+        for source, file_path, title, error in group:
+            item = {"file": source, "output": None, "duration": 0.0,
+                    "speech_duration": None, "error": error}
+            items.append(item)
+            if error:
+                continue
+            try:
+                key = None
+                if cache is not None:
+                    key = cache.make_key(file_path, model_size, language, task, vad, batched=True)
+                    result = cache.get(key)
+                    if result is not None:
+                        item["result"] = result
+                        item["title"] = title
+                        continue
+                audio, duration, timeline = transcriber.prepare_audio(file_path, vad, store)
+                pending.append((item, title, key, audio, duration, timeline))
+            except Exception as e:
+                item["error"] = str(e)
+
+        if pending:
+            try:
+                if model is None:
+                    model = transcriber.load_model(model_size)
+                with metrics.span("transcribe", batched=len(pending)):
+                    decoded = batched.transcribe_audios(model, [p[3] for p in pending],
+                                                        language, translate, batch_size)
+                for (item, title, key, audio, duration, timeline), result in zip(pending, decoded):
+                    item["result"] = transcriber.finish_result(result, audio, duration, timeline)
+                    item["title"] = title
+                    if cache is not None:
+                        cache.put(key, item["result"])
+            except Exception as e:
+                for item, *_ in pending:
+                    item["error"] = f"Transcription failed: {str(e)}"
+
+        elapsed = time.time() - start
+        group_audio = sum(item["result"]["duration"] for item in items if "result" in item)
+        for item in items:
+            result = item.pop("result", None)
+            title = item.pop("title", None)
+            if result is not None and not item["error"]:
+                try:
+                    item["output"] = _save(result, title, output_dir, formats, timestamps)
+                    item["duration"] = result["duration"]
+                    item["speech_duration"] = result.get("speech_duration")
+                except Exception as e:
+                    item["error"] = str(e)
+            # Share the group's time out by audio length
+            item["elapsed"] = elapsed * item["duration"] / group_audio if group_audio else elapsed
+            queue.release(item["file"])
+            results.append(item)
+            _report_item(item, len(results), len(files), report)
+
+    _report_summary(results, time.time() - batch_start, report)
+    if queue.urls:
+        report(queue.format_stats())
+    return results
+
+
+def _save(result, title, output_dir, formats, timestamps):
+    # Returns the path of the first format, the one reported as the output
+    paths = export.save_result(result, title, output_dir, formats, timestamps)
+    return paths[formats[0]]
+
+
+def _register_stats(queue, cache=None, store=None):
+    # Stats of caches living in this process; pool workers register their
+    # own and send them back with each result
+    metrics.register("download_cache", queue.cache.stats)
+    if cache is not None:
+        metrics.register("transcript_cache", cache.stats)
+    if store is not None:
+        metrics.register("audio_store", store.stats)
+
+
+def _report_item(item, done, total, report):
+    name = os.path.basename(item["file"])
+    metrics.count("files", state="failed" if item["error"] else "done")
+    metrics.count("audio_seconds", item["duration"])
+    if item["error"]:
+        report(f"[{done}/{total}] FAILED {name}: {item['error']}")
+        return
+    speed = item["duration"] / item["elapsed"] if item["elapsed"] else 0.0
+    line = (f"[{done}/{total}] {name}: "
+            f"{item['duration']:.1f}s audio in {item['elapsed']:.1f}s ({speed:.2f}x)")
+    if item["speech_duration"] is not None:
+        line += ", " + format_speedup(item["duration"], item["speech_duration"])
+    report(line)
+
+
+def _report_summary(results, wall, report):
+    audio_total = sum(item["duration"] for item in results)
+    failed = sum(1 for item in results if item["error"])
+    report(f"Done: {len(results) - failed} ok, {failed} failed, "
+           f"{audio_total:.1f}s audio in {wall:.1f}s "
+           f"({audio_total / wall if wall else 0.0:.2f} audio-s/s)")
+
+
+def add_arguments(parser):
+    parser.add_argument("inputs", nargs="+",
+                        help="media files, YouTube URLs, directories, or .txt files listing them")
+    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"])
+    parser.add_argument("--backend", default="fp32", choices=transcriber.BACKENDS,
+                        help="int8 quantizes the linear layers for faster CPU inference; mmap "
+                             "and bf16 map the weights from disk so workers share them")
+    parser.add_argument("--language", default="auto", help="language code, or 'auto' to detect")
+    parser.add_argument("--translate", action="store_true", help="translate to English")
+    parser.add_argument("--timestamps", action="store_true", help="include timestamps")
+    parser.add_argument("--formats", nargs="+", default=["txt"], choices=export.FORMATS,
+                        help="output formats written for each file")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--output", default="output", help="output directory")
+    parser.add_argument("--vad", action="store_true",
+                        help="skip silence with voice activity detection before transcribing")
+    parser.add_argument("--chunked", action="store_true",
+                        help="split each file into chunks transcribed in parallel (for long files)")
+    parser.add_argument("--chunk-seconds", type=int, default=chunking.DEFAULT_CHUNK_SECONDS,
+                        help="nominal chunk length for --chunked")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="decode this many 30-second windows per forward pass in one "
+                             "process instead of using worker processes")
+    parser.add_argument("--prefetch", type=int, default=2,
+                        help="number of YouTube downloads to run ahead of transcription")
+    parser.add_argument("--metrics-log", default=None,
+                        help="append per-stage timing spans to this JSON-lines file")
+    parser.add_argument("--metrics-prom", default=None,
+                        help="write counters in Prometheus text format to this file at the end")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always transcribe, ignoring cached transcripts")
+
+
+def main(args):
+    if args.metrics_log or args.metrics_prom:
+        metrics.configure(args.metrics_log)
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("Error: no media files found")
+        sys.exit(1)
+
+    language = None if args.language == "auto" else args.language
+    model = transcriber.model_name(args.model, args.backend)
+    if args.chunked and args.batch_size:
+        print("Error: --chunked and --batch-size can't be combined")
+        sys.exit(1)
+    if args.chunked and args.vad:
+        print("Error: --chunked and --vad can't be combined")
+        sys.exit(1)
+    if args.batch_size:
+        results = run_batched(files, model, language, args.translate, args.timestamps,
+                              args.batch_size, args.output, use_cache=not args.no_cache,
+                              vad=args.vad, prefetch=args.prefetch, formats=args.formats)
+    elif args.chunked:
+        results = run_chunked(files, model, language, args.translate, args.timestamps,
+                              args.workers, args.output, use_cache=not args.no_cache,
+                              chunk_seconds=args.chunk_seconds, prefetch=args.prefetch,
+                              formats=args.formats)
+    else:
+        results = run_batch(files, model, language, args.translate, args.timestamps,
+                            args.workers, args.output, use_cache=not args.no_cache, vad=args.vad,
+                            prefetch=args.prefetch, formats=args.formats)
+    try:
+        added, _ = search.SearchIndex(os.path.join(args.output, "search.db")).sync(args.output)
+        if added:
+            print(f"Search index: {added} transcript(s) added")
+    except Exception as e:
+        print(f"Could not update search index: {str(e)}")
+    if args.metrics_prom:
+        with open(args.metrics_prom, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus())
+    if any(item["error"] for item in results):
+        sys.exit(1)
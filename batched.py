@@ -0,0 +1,185 @@
+"""Batched Whisper inference: many 30-second windows per encoder and decoder pass"""
+import numpy as np
+import torch
+import whisper
+from whisper.tokenizer import get_tokenizer
+
+import transcriber
+import chunking
+
+SAMPLE_RATE = transcriber.SAMPLE_RATE
+
+# Windows are cut near quiet points every WINDOW_SECONDS, moved by up to
+# SPLIT_SEARCH_SECONDS, which keeps every window (the last one included)
+# within Whisper's 30 second context
+WINDOW_SECONDS = 24
+SPLIT_SEARCH_SECONDS = 3
+
+DEFAULT_BATCH_SIZE = 8
+
+# Same fallback rules as whisper.transcribe
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+def plan_windows(audio):
+    """(start, end) sample ranges of at most 30 seconds covering audio"""
+    bounds = [0] + chunking.find_split_points(audio, SAMPLE_RATE, WINDOW_SECONDS,
+                                              SPLIT_SEARCH_SECONDS) + [len(audio)]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def _mel(model, audio):
+    audio = whisper.pad_or_trim(np.asarray(audio, dtype=np.float32))
+    return whisper.log_mel_spectrogram(audio, model.dims.n_mels)
+
+
+def _is_silent(result):
+    # whisper.transcribe's no-voice check: skip the window unless its log
+    # probability is high enough despite the no-speech probability
+    should_skip = result.no_speech_prob > NO_SPEECH_THRESHOLD
+    if result.avg_logprob > LOGPROB_THRESHOLD:
+        should_skip = False
+    return should_skip
+
+
+def _needs_fallback(result):
+    # whisper.transcribe's rule for decoding again at the next temperature
+    needs_fallback = False
+    if result.compression_ratio > COMPRESSION_RATIO_THRESHOLD:
+        needs_fallback = True  # too repetitive
+    if result.avg_logprob < LOGPROB_THRESHOLD:
+        needs_fallback = True  # average log probability is too low
+    if (result.no_speech_prob > NO_SPEECH_THRESHOLD
+            and result.avg_logprob < LOGPROB_THRESHOLD):
+        needs_fallback = False  # silence
+    return needs_fallback
+
+
+def decode_batch(model, mel, language, task):
+    """Greedy-decode a (batch, n_mels, frames) mel tensor in one pass.
+
+    Rows that fail whisper's quality checks are decoded again, still
+    batched, at the next temperature. Returns one DecodingResult per row.
+    """
+    results = [None] * len(mel)
+    pending = list(range(len(mel)))
+    for temperature in TEMPERATURES:
+        options = whisper.DecodingOptions(task=task, language=language, temperature=temperature,
+                                          fp16=model.device.type != "cpu")
+        decoded = whisper.decode(model, mel[pending], options)
+        retry = []
+        for index, result in zip(pending, decoded):
+            results[index] = result
+            if _needs_fallback(result):
+                retry.append(index)
+        pending = retry
+        if not pending:
+            break
+    return results
+
+
+def segments_from_tokens(tokenizer, result, offset, duration):
+    """Split one window's tokens into segments at timestamp tokens.
+
+    Times are shifted by offset and clamped to the window's real duration
+    (the tail of the last window is padding).
+    """
+    time_precision = whisper.audio.HOP_LENGTH * 2 / SAMPLE_RATE
+    segments = []
+    start = 0.0
+    text_tokens = []
+
+    def close(end):
+        text = tokenizer.decode(text_tokens)
+        if text.strip():
+            segments.append({
+                "seek": int(offset * 100),
+                "start": offset + min(start, duration),
+                "end": offset + min(max(end, start), duration),
+                "text": text,
+                "tokens": list(text_tokens),
+                "temperature": result.temperature,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            })
+
+    for token in result.tokens:
+        if token >= tokenizer.timestamp_begin:
+            time = (token - tokenizer.timestamp_begin) * time_precision
+            if text_tokens:
+                close(time)
+                text_tokens = []
+            start = time
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        close(duration)
+    return [segment for segment in segments if segment["start"] < offset + duration]
+
+
+def detect_languages(model, audios, batch_size=DEFAULT_BATCH_SIZE):
+    """Most likely language of each audio, from its first 30s of speech"""
+    languages = []
+    for i in range(0, len(audios), batch_size):
+        mel = torch.stack([_mel(model, chunking.first_speech(audio, SAMPLE_RATE))
+                           for audio in audios[i:i + batch_size]])
+        _, probs = model.detect_language(mel.to(model.device))
+        languages.extend(max(p, key=p.get) for p in probs)
+    return languages
+
+
+def transcribe_audios(model, audios, language=None, translate=False,
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """Transcribe several decoded recordings, batch_size windows at a time.
+
+    Windows from all recordings are pooled, so short files fill a batch
+    together and a long file fills it on its own. Returns one result dict
+    (text, segments, language) per audio, like model.transcribe. Unlike
+    model.transcribe, windows are decoded independently, without the
+    previous window's text as prompt.
+    """
+    task = "translate" if translate else "transcribe"
+    if language:
+        languages = [language] * len(audios)
+    else:
+        languages = detect_languages(model, audios, batch_size)
+
+    windows = []  # (audio index, start sample, end sample)
+    for i, audio in enumerate(audios):
+        windows.extend((i, start, end) for start, end in plan_windows(audio))
+
+    # One decode call handles one language, so batch windows per language
+    by_language = {}
+    for index, (i, _, _) in enumerate(windows):
+        by_language.setdefault(languages[i], []).append(index)
+
+    segments = [[] for _ in audios]
+    for window_language, indices in by_language.items():
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                  language=window_language, task=task)
+        for b in range(0, len(indices), batch_size):
+            batch = [windows[index] for index in indices[b:b + batch_size]]
+            mel = torch.stack([_mel(model, audios[i][start:end]) for i, start, end in batch])
+            results = decode_batch(model, mel.to(model.device), window_language, task)
+            for (i, start, end), result in zip(batch, results):
+                if _is_silent(result):
+                    continue
+                segments[i].append((start, segments_from_tokens(
+                    tokenizer, result, start / SAMPLE_RATE, (end - start) / SAMPLE_RATE)))
+
+    output = []
+    for i in range(len(audios)):
+        ordered = [segment for _, window in sorted(segments[i], key=lambda w: w[0])
+                   for segment in window]
+        for n, segment in enumerate(ordered):
+            segment["id"] = n
+        output.append({
+            "text": "".join(segment["text"] for segment in ordered),
+            "segments": ordered,
+            "language": languages[i],
+        })
+    return output
@@ -0,0 +1,619 @@
+"""Offline benchmark of the transcription pipeline per model size, thread count and input length"""
+import os
+import re
+import sys
+import json
+import time
+import wave
+import shutil
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+
+import numpy as np
+
+import transcriber
+import quantize
+import lowmem
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_RATE = transcriber.SAMPLE_RATE
+
+DEFAULT_LENGTHS = (30, 120, 600)
+DEFAULT_HISTORY = os.path.join("bench", "history.json")
+DEFAULT_FIXTURE_DIR = os.path.join("bench", "fixtures")
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm", ".mp4")
+# A run fails when a result is this much slower (or bigger) than the last
+# recorded run with the same model, threads and length
+DEFAULT_MAX_REGRESSION = 0.2
+# --compare-batched fails when a batched transcript differs from the
+# unbatched one by more than this word error rate
+DEFAULT_MAX_BATCHED_WER = 0.05
+DEFAULT_BATCH_SIZE = 8
+
+STAGES = ("download", "decode", "inference", "format", "write")
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_METRICS = ("module_import", "whisper_import", "first_paint", "engine_ready")
+# Holds the launch time when the GUI is started by the startup benchmark; the
+# app then prints its startup timings as JSON and exits once the engine is loaded
+STARTUP_PROBE_ENV = "TRANSCRIBER_STARTUP_PROBE"
+
+
+def synth_speech(seconds, seed=0):
+    """Speech-like test signal: voiced 'syllables' at a few per second with a
+    wandering pitch, formant-like harmonics and pauses between 'phrases'"""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        # One phrase of 3-12 syllables, then a pause
+        for _ in range(rng.integers(3, 13)):
+            length = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = rng.uniform(90, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+            phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+            formants = rng.uniform([300, 900, 2200], [900, 2200, 3200])
+            syllable = np.zeros(length)
+            for harmonic in range(1, 30):
+                frequency = pitch * harmonic
+                gain = sum(np.exp(-((frequency - f) / 150) ** 2) for f in formants)
+                syllable += gain * np.sin(harmonic * phase)
+            syllable *= np.hanning(length)
+            end = min(position + length, len(audio))
+            audio[position:end] += syllable[:end - position]
+            position += length + int(rng.uniform(0.02, 0.08) * SAMPLE_RATE)
+            if position >= len(audio):
+                break
+        position += int(rng.uniform(0.3, 1.0) * SAMPLE_RATE)
+
+    audio += rng.normal(0, 0.003, len(audio)).astype(np.float32)
+    return 0.5 * audio / max(np.abs(audio).max(), 1e-6)
+
+
+def write_wav(path, audio):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def make_fixtures(lengths, fixture_dir=DEFAULT_FIXTURE_DIR):
+    """WAV fixture path per length, generated once and reused afterwards"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    fixtures = {}
+    for seconds in lengths:
+        path = os.path.join(fixture_dir, f"speech_{seconds}s.wav")
+        if not os.path.exists(path):
+            write_wav(path, synth_speech(seconds, seed=seconds))
+        fixtures[seconds] = path
+    return fixtures
+
+
+def find_weights(model_size, model_dir):
+    """Path of locally provided weights for model_size; never downloads"""
+    import whisper
+    path = os.path.join(model_dir, os.path.basename(whisper._MODELS[model_size]))
+    if not os.path.isfile(path):
+        raise Exception(f"Model weights not found: {path}")
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed(stages, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    stages[name] = time.perf_counter() - start
+    return value
+
+
+def run_config(model_size, threads, fixtures, model_dir, language="en", backend="fp32"):
+    """Run the pipeline on every fixture with one model, backend and thread count.
+
+    fixtures maps a label (the length for generated fixtures) to an audio
+    file. Meant to run in a fresh process so peak RSS belongs to this config
+    only. Returns one result dict per fixture, including the transcript text.
+    """
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+
+    # This process only loads one model, so the peak from here on is the load's
+    lowmem.reset_peak()
+    start = time.perf_counter()
+    if backend in ("mmap", "bf16"):
+        model = lowmem.load_mmap(find_weights(model_size, model_dir),
+                                 "bf16" if backend == "bf16" else "fp32")
+    else:
+        model = whisper.load_model(find_weights(model_size, model_dir), device="cpu")
+    # Loading from a path skips the named model's alignment heads; set them
+    # so the benchmarked model is the one the app loads
+    model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_size])
+    if backend == "int8":
+        model = quantize.quantize_model(model)
+    load_seconds = time.perf_counter() - start
+    load_peak_rss_mb = lowmem.memory_usage()["peak_rss_mb"]
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        for label, fixture in sorted(fixtures.items()):
+            stages = {}
+            # Stand-in for a download: copy the fixture into a scratch dir
+            audio_file = _timed(stages, "download", shutil.copy, fixture, work_dir)
+            audio = _timed(stages, "decode", transcriber.load_audio, audio_file)
+            result = _timed(stages, "inference", model.transcribe, audio, language=language,
+                            fp16=False, verbose=None)
+            transcript = _timed(stages, "format", transcriber.format_result, result, True)
+            _timed(stages, "write", transcriber.save_transcript, transcript,
+                   f"bench_{model_size}_{label}", work_dir)
+            wall = sum(stages.values())
+            seconds = len(audio) / SAMPLE_RATE
+            results.append({
+                "model": model_size,
+                "backend": backend,
+                "threads": threads,
+                "fixture": label,
+                "seconds": seconds,
+                "text": result["text"],
+                "stages": stages,
+                "wall": wall,
+                "rtf": wall / seconds,
+                "model_load": load_seconds,
+                "load_peak_rss_mb": load_peak_rss_mb,
+                "peak_rss_mb": peak_rss_mb(),
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def run_batched_config(model_size, threads, fixtures, model_dir, language="en",
+                       batch_size=DEFAULT_BATCH_SIZE):
+    """Transcribe every fixture with model.transcribe, one file at a time,
+    and then with batched.transcribe_audios in one call, using the same
+    loaded model. Returns the texts and wall time of both paths."""
+    import torch
+    import whisper
+    import batched
+    torch.set_num_threads(threads)
+
+    model = whisper.load_model(find_weights(model_size, model_dir), device="cpu")
+    labels = sorted(fixtures)
+    audios = [transcriber.load_audio(fixtures[label]) for label in labels]
+
+    start = time.perf_counter()
+    unbatched = [model.transcribe(audio, language=language, fp16=False, verbose=None)["text"]
+                 for audio in audios]
+    unbatched_wall = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = batched.transcribe_audios(model, audios, language, batch_size=batch_size)
+    batched_wall = time.perf_counter() - start
+
+    return {
+        "fixtures": labels,
+        "seconds": sum(len(audio) for audio in audios) / SAMPLE_RATE,
+        "unbatched": unbatched,
+        "batched": [result["text"] for result in results],
+        "unbatched_wall": unbatched_wall,
+        "batched_wall": batched_wall,
+    }
+
+
+def _run_child(target, args, connection):
+    try:
+        connection.send(("ok", target(*args)))
+    except Exception as e:
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+
+def _isolated(target, args):
+    # target(*args) in a fresh process; returns its result
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child, args=(target, args, sender))
+    process.start()
+    sender.close()
+    try:
+        status, payload = receiver.recv()
+    except EOFError:
+        status, payload = "error", "benchmark process exited unexpectedly"
+    process.join()
+    if status == "error":
+        model_size, threads = args[:2]
+        raise Exception(f"{model_size} with {threads} thread(s) failed: {payload}")
+    return payload
+
+
+def run_isolated(model_size, threads, fixtures, model_dir, language="en", backend="fp32"):
+    """run_config in a fresh process"""
+    return _isolated(run_config, (model_size, threads, fixtures, model_dir, language, backend))
+
+
+def load_history(path=DEFAULT_HISTORY):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_history(history, path=DEFAULT_HISTORY):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def find_regressions(results, history, max_regression=DEFAULT_MAX_REGRESSION):
+    """Messages for results whose real-time factor, model load time or peak
+    RSS (of the load or the whole run) exceed the last recorded run of the
+    same config by max_regression"""
+    def key(result):
+        return (result["model"], result.get("backend", "fp32"), result["threads"],
+                result["seconds"])
+
+    previous = {}
+    for run in history:
+        for result in run["results"]:
+            previous[key(result)] = result
+
+    regressions = []
+    for result in results:
+        baseline = previous.get(key(result))
+        if baseline is None:
+            continue
+        for metric in ("rtf", "model_load", "load_peak_rss_mb", "peak_rss_mb"):
+            old, new = baseline.get(metric), result.get(metric)
+            if old and new is not None and new > old * (1 + max_regression):
+                regressions.append(
+                    f"{result['model']} x{result['threads']} {result['seconds']}s: "
+                    f"{metric} {old:.3f} -> {new:.3f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def format_result(result):
+    stages = " ".join(f"{name} {result['stages'][name]:.2f}s" for name in STAGES)
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/a"
+    return (f"{transcriber.model_name(result['model'], result.get('backend', 'fp32')):>11} "
+            f"x{result['threads']:<2} {result['seconds']:>6.0f}s: "
+            f"RTF {result['rtf']:.3f}, load {result['model_load']:.2f}s, peak RSS {rss} "
+            f"({stages})")
+
+
+def run_benchmark(models, threads, lengths, model_dir, history_path=DEFAULT_HISTORY,
+                  fixture_dir=DEFAULT_FIXTURE_DIR, max_regression=DEFAULT_MAX_REGRESSION,
+                  language="en", report=print):
+    """Benchmark every model and thread count, append the run to the history
+    and return the list of regression messages"""
+    fixtures = make_fixtures(lengths, fixture_dir)
+    results = []
+    for model_size in models:
+        for thread_count in threads:
+            for result in run_isolated(model_size, thread_count, fixtures, model_dir, language):
+                result.pop("text")
+                report(format_result(result))
+                results.append(result)
+
+    import whisper
+    history = load_history(history_path)
+    regressions = find_regressions(results, history, max_regression)
+    history.append({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "whisper_version": whisper.__version__,
+        "results": results,
+    })
+    save_history(history, history_path)
+    return regressions
+
+
+def normalize_words(text):
+    """Lowercase words without punctuation, for scoring"""
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Word-level Levenshtein distance, one row at a time
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1,
+                                           previous + (ref_word != hyp_word))
+    return row[-1] / len(ref)
+
+
+def find_audio_fixtures(audio_dir):
+    """{file name: path} of the audio files in audio_dir and {file name:
+    reference text} from the .txt files next to them"""
+    fixtures = {}
+    references = {}
+    for name in sorted(os.listdir(audio_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        fixtures[name] = os.path.join(audio_dir, name)
+        reference_path = os.path.join(audio_dir, stem + ".txt")
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                references[name] = f.read()
+    if not fixtures:
+        raise Exception(f"No audio files found in {audio_dir}")
+    return fixtures, references
+
+
+def compare_backends(models, threads, audio_dir, model_dir, history_path=DEFAULT_HISTORY,
+                     language="en", report=print):
+    """Speed, peak RSS and word error rate of every backend against fp32.
+
+    WER is scored against the .txt reference next to each audio file, or
+    against the fp32 transcript when there is none. Returns one summary
+    dict per model and backend and appends them to the history.
+    """
+    fixtures, references = find_audio_fixtures(audio_dir)
+    summaries = []
+    for model_size in models:
+        runs = {backend: run_isolated(model_size, threads, fixtures, model_dir, language, backend)
+                for backend in transcriber.BACKENDS}
+        baseline = {result["fixture"]: result["text"] for result in runs["fp32"]}
+        for backend, results in runs.items():
+            errors = []
+            for result in results:
+                reference = references.get(result["fixture"], baseline[result["fixture"]])
+                errors.append(word_error_rate(reference, result["text"]))
+            audio_seconds = sum(result["seconds"] for result in results)
+            summaries.append({
+                "model": model_size,
+                "backend": backend,
+                "threads": threads,
+                "load_seconds": results[0]["model_load"],
+                "rtf": sum(result["wall"] for result in results) / audio_seconds,
+                "peak_rss_mb": results[-1]["peak_rss_mb"],
+                "wer": statistics.mean(errors),
+                "wer_reference": "text" if references else "fp32",
+            })
+
+    report(f"{'model':>11} {'load':>7} {'RTF':>7} {'peak RSS':>10} {'WER':>7}")
+    for summary in summaries:
+        rss = f"{summary['peak_rss_mb']:.0f} MB" if summary["peak_rss_mb"] is not None else "n/a"
+        report(f"{transcriber.model_name(summary['model'], summary['backend']):>11} "
+               f"{summary['load_seconds']:>6.2f}s {summary['rtf']:>7.3f} {rss:>10} "
+               f"{summary['wer'] * 100:>6.1f}%")
+    if not references:
+        report("No reference transcripts found; WER is measured against fp32 output")
+
+    history = load_history(history_path)
+    history.append({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "comparison": summaries,
+        "results": [],
+    })
+    save_history(history, history_path)
+    return summaries
+
+
+def compare_batched(models, threads, audio_dir, model_dir, history_path=DEFAULT_HISTORY,
+                    language="en", batch_size=DEFAULT_BATCH_SIZE,
+                    max_wer=DEFAULT_MAX_BATCHED_WER, report=print):
+    """Throughput of batched inference against model.transcribe, and how far
+    its transcripts drift from the unbatched ones.
+
+    Each batched transcript is scored against the unbatched transcript of
+    the same file; with .txt references next to the audio both paths are
+    scored against those too. Appends the summaries to the history and
+    returns a message per file whose batched WER exceeds max_wer.
+    """
+    fixtures, references = find_audio_fixtures(audio_dir)
+    summaries = []
+    mismatches = []
+    for model_size in models:
+        run = _isolated(run_batched_config, (model_size, threads, fixtures, model_dir,
+                                             language, batch_size))
+        drift = []
+        for label, unbatched, batched in zip(run["fixtures"], run["unbatched"], run["batched"]):
+            wer = word_error_rate(unbatched, batched)
+            drift.append(wer)
+            if wer > max_wer:
+                mismatches.append(f"{model_size} {label}: batched output differs from "
+                                  f"unbatched by {wer * 100:.1f}% WER")
+        summary = {
+            "model": model_size,
+            "threads": threads,
+            "batch_size": batch_size,
+            "unbatched_throughput": run["seconds"] / run["unbatched_wall"],
+            "batched_throughput": run["seconds"] / run["batched_wall"],
+            "wer_vs_unbatched": statistics.mean(drift),
+            "identical": sum(normalize_words(a) == normalize_words(b)
+                             for a, b in zip(run["unbatched"], run["batched"])),
+            "files": len(run["fixtures"]),
+        }
+        if references:
+            for path in ("unbatched", "batched"):
+                summary[f"{path}_wer"] = statistics.mean(
+                    word_error_rate(references[label], text)
+                    for label, text in zip(run["fixtures"], run[path]) if label in references)
+        summaries.append(summary)
+
+    report(f"{'model':>7} {'unbatched':>11} {'batched':>11} {'speedup':>8} "
+           f"{'drift WER':>10} {'identical':>10}")
+    for summary in summaries:
+        report(f"{summary['model']:>7} {summary['unbatched_throughput']:>9.2f}x "
+               f"{summary['batched_throughput']:>9.2f}x "
+               f"{summary['batched_throughput'] / summary['unbatched_throughput']:>7.2f}x "
+               f"{summary['wer_vs_unbatched'] * 100:>9.1f}% "
+               f"{summary['identical']:>4}/{summary['files']}")
+        if references:
+            report(f"{'':>7} WER against references: unbatched "
+                   f"{summary['unbatched_wer'] * 100:.1f}%, batched {summary['batched_wer'] * 100:.1f}%")
+
+    history = load_history(history_path)
+    history.append({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "batched_comparison": summaries,
+        "results": [],
+    })
+    save_history(history, history_path)
+    return mismatches
+
+
+def _time_import(module):
+    # Seconds a fresh interpreter spends importing module
+    code = ("import time; start = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - start)")
+    output = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _probe_gui(timeout=120):
+    """Launch-to-first-paint and launch-to-engine-ready of the GUI, or None
+    when no window can be opened (e.g. no display)"""
+    env = dict(os.environ)
+    env[STARTUP_PROBE_ENV] = repr(time.time())
+    # A scratch working directory so the probe sees no queued jobs
+    work_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        process = subprocess.run([sys.executable, os.path.join(APP_DIR, "main.py")], env=env,
+                                 cwd=work_dir, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for line in reversed(process.stdout.splitlines()):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue
+    return None
+
+
+def measure_startup(repeats=3, report=print):
+    """Median startup timings in seconds over `repeats` cold launches"""
+    samples = {metric: [] for metric in STARTUP_METRICS}
+    for _ in range(repeats):
+        samples["module_import"].append(_time_import("main"))
+        samples["whisper_import"].append(_time_import("whisper"))
+        probe = _probe_gui()
+        if probe is None:
+            continue
+        samples["first_paint"].append(probe["first_paint"])
+        samples["engine_ready"].append(probe["engine_ready"])
+    if not samples["first_paint"]:
+        report("GUI could not be opened; measured imports only")
+    return {metric: statistics.median(values) for metric, values in samples.items() if values}
+
+
+def run_startup_benchmark(repeats=3, history_path=DEFAULT_HISTORY,
+                          max_regression=DEFAULT_MAX_REGRESSION, report=print):
+    """Measure startup, append it to the history and return regression messages"""
+    startup = measure_startup(repeats, report)
+    report("Startup: " + ", ".join(f"{metric} {seconds:.3f}s" for metric, seconds in startup.items()))
+
+    history = load_history(history_path)
+    previous = next((run["startup"] for run in reversed(history) if run.get("startup")), {})
+    regressions = []
+    for metric, seconds in startup.items():
+        old = previous.get(metric)
+        if old and seconds > old * (1 + max_regression):
+            regressions.append(f"startup {metric}: {old:.3f} -> {seconds:.3f} "
+                               f"(+{(seconds / old - 1) * 100:.0f}%)")
+    history.append({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "startup": startup,
+        "results": [],
+    })
+    save_history(history, history_path)
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument("--models", nargs="+", default=["tiny", "base"],
+                        choices=["tiny", "base", "small", "medium", "large"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[os.cpu_count() or 1],
+                        help="torch thread counts to try")
+    parser.add_argument("--lengths", nargs="+", type=int, default=list(DEFAULT_LENGTHS),
+                        help="fixture lengths in seconds")
+    parser.add_argument("--model-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "whisper"),
+                        help="directory holding the Whisper .pt weights (nothing is downloaded)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON file results are appended to")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR,
+                        help="directory for the generated audio fixtures")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="fail when a metric is this fraction worse than the previous run")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure import time and launch-to-first-paint instead of models")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="launches per startup measurement (the median is kept)")
+    parser.add_argument("--compare-int8", metavar="AUDIO_DIR",
+                        help="compare every backend with fp32 on the audio files in "
+                             "AUDIO_DIR, scoring WER against same-named .txt references")
+    parser.add_argument("--compare-batched", metavar="AUDIO_DIR",
+                        help="compare batched inference with model.transcribe on the audio "
+                             "files in AUDIO_DIR: throughput and how far the transcripts differ")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="windows per forward pass for --compare-batched")
+    parser.add_argument("--max-wer", type=float, default=DEFAULT_MAX_BATCHED_WER,
+                        help="fail --compare-batched when a batched transcript differs from "
+                             "the unbatched one by more than this word error rate")
+
+
+def main(args):
+    try:
+        if args.startup:
+            regressions = run_startup_benchmark(args.repeats, args.history, args.max_regression)
+        elif args.compare_int8:
+            compare_backends(args.models, args.threads[0], args.compare_int8, args.model_dir,
+                             args.history)
+            print(f"Comparison appended to {args.history}")
+            return
+        elif args.compare_batched:
+            mismatches = compare_batched(args.models, args.threads[0], args.compare_batched,
+                                         args.model_dir, args.history, batch_size=args.batch_size,
+                                         max_wer=args.max_wer)
+            if mismatches:
+                print("Batched output differs:")
+                for message in mismatches:
+                    print(f"  {message}")
+                sys.exit(1)
+            print(f"Batched output matches; comparison appended to {args.history}")
+            return
+        else:
+            regressions = run_benchmark(args.models, args.threads, args.lengths, args.model_dir,
+                                        args.history, args.fixtures, args.max_regression)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    if regressions:
+        print("Regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"No regressions; results appended to {args.history}")
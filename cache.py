@@ -0,0 +1,89 @@
+"""On-disk transcript cache keyed by input content and transcription settings"""
+import os
+import json
+import hashlib
+import tempfile
+
+from lru import HitCounter, evict_lru, touch
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "transcripts")
+# Size limit for cached transcripts, override with TRANSCRIBER_CACHE_MB
+DEFAULT_CACHE_MB = int(os.environ.get("TRANSCRIBER_CACHE_MB", "512"))
+
+
+def file_digest(file_path, block_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache(HitCounter):
+    """Stores Whisper results as JSON files named after a content hash.
+
+    Entries are written atomically so several processes can share one cache
+    directory. Once the directory grows past the size limit the least recently
+    used entries are removed.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, file_path, model_size, language=None, task="transcribe", vad=False,
+                 batched=False, chunked=False, streamed=False, digest=None):
+        """Key for file_path with these settings; pass digest when the
+        file_digest of file_path is already known"""
+        import whisper
+        parts = [
+            digest or file_digest(file_path),
+            model_size,
+            language or "auto",
+            task,
+            whisper.__version__,
+        ]
+        if vad:
+            parts.append("vad")
+        if batched:
+            parts.append("batched")
+        if chunked:
+            parts.append("chunked")
+        if streamed:
+            parts.append("streamed")
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.count_lookup(False)
+            return None
+
+        touch(path)
+        self.count_lookup(True)
+        return result
+
+    def put(self, key, result):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until under the size limit"""
+        evict_lru(self.cache_dir, ".json", self.max_bytes)
@@ -0,0 +1,233 @@
+"""Split one long recording into overlapping chunks and transcribe them in parallel"""
+import os
+import re
+import multiprocessing
+
+import numpy as np
+
+import transcriber
+import vad as vad_filter
+from audio_store import open_pcm
+from metrics import metrics
+
+SAMPLE_RATE = transcriber.SAMPLE_RATE
+
+DEFAULT_CHUNK_SECONDS = 600
+DEFAULT_OVERLAP_SECONDS = 10
+# How far from the nominal boundary to look for a quiet split point
+SPLIT_SEARCH_SECONDS = 30
+# first_speech runs VAD over blocks this long rather than the whole file
+SPEECH_SCAN_SECONDS = 300
+
+_worker_model = None
+
+
+def find_split_points(audio, sample_rate, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                      search_seconds=SPLIT_SEARCH_SECONDS):
+    """Sample positions roughly every chunk_seconds, each moved to the
+    quietest frame within search_seconds of the nominal boundary.
+
+    Frame energy is only computed inside those search windows, so memory
+    stays flat however long the (possibly memory-mapped) audio is.
+    """
+    frame = int(vad_filter.FRAME_SECONDS * sample_rate)
+    chunk = int(chunk_seconds * sample_rate)
+    search = int(search_seconds * sample_rate)
+    n_frames = len(audio) // frame
+
+    points = []
+    target = chunk
+    # Don't leave a tiny final chunk
+    while target < len(audio) - max(search, chunk // 4):
+        lo = max((target - search) // frame, 0)
+        hi = min((target + search) // frame, n_frames)
+        if hi > lo:
+            energy = vad_filter.frame_energy_db(audio[lo * frame:hi * frame], sample_rate)
+            target = (lo + int(np.argmin(energy))) * frame + frame // 2
+        points.append(target)
+        target += chunk
+    return points
+
+
+def plan_chunks(audio, sample_rate, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                overlap_seconds=DEFAULT_OVERLAP_SECONDS):
+    """(start, end) sample ranges covering audio; every chunk but the last
+    runs overlap_seconds past the next chunk's start"""
+    overlap = int(overlap_seconds * sample_rate)
+    bounds = [0] + find_split_points(audio, sample_rate, chunk_seconds) + [len(audio)]
+    chunks = []
+    for i in range(len(bounds) - 1):
+        end = bounds[i + 1] if i == len(bounds) - 2 else min(bounds[i + 1] + overlap, len(audio))
+        chunks.append((bounds[i], end))
+    return chunks
+
+
+def _normalize(text):
+    return re.sub(r"[^\w]+", " ", text.lower()).strip()
+
+
+def stitch_segments(chunk_results):
+    """Merge per-chunk segment lists into one timeline.
+
+    chunk_results is a list of (chunk_start_seconds, chunk_end_seconds,
+    segments) with segment times relative to the chunk. In each overlap the
+    earlier chunk wins up to the middle of the overlap; later segments that
+    end before the last kept segment or repeat its text are dropped.
+    """
+    merged = []
+    for i, (chunk_start, chunk_end, segments) in enumerate(chunk_results):
+        if i + 1 < len(chunk_results):
+            next_start = chunk_results[i + 1][0]
+            handover = (next_start + chunk_end) / 2
+        else:
+            handover = None
+
+        for segment in segments:
+            segment = dict(segment)
+            segment["start"] += chunk_start
+            segment["end"] += chunk_start
+            if handover is not None and segment["start"] >= handover:
+                break
+            if merged:
+                previous = merged[-1]
+                midpoint = (segment["start"] + segment["end"]) / 2
+                if midpoint <= previous["end"]:
+                    continue
+                if _normalize(segment["text"]) and _normalize(segment["text"]) == _normalize(previous["text"]):
+                    continue
+            merged.append(segment)
+
+    for i, segment in enumerate(merged):
+        segment["id"] = i
+    return merged
+
+
+def _init_worker(model_size, threads, collect_metrics=False):
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    if collect_metrics and not metrics.enabled:
+        metrics.configure()
+    _worker_model = transcriber.load_model(model_size)
+
+
+def _detect_language(audio):
+    import whisper
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), _worker_model.dims.n_mels)
+    _, probs = _worker_model.detect_language(mel.to(_worker_model.device))
+    return max(probs, key=probs.get)
+
+
+def _transcribe_chunk(job):
+    source, options = job
+    if isinstance(source, tuple):
+        # (pcm_path, start, end): map the shared store file instead of pickling audio
+        pcm_path, start, end = source
+        audio = open_pcm(pcm_path)[start:end]
+    else:
+        audio = source
+    segments = _worker_model.transcribe(audio, verbose=None, **options)["segments"]
+    # The model load span is sent back with the first chunk
+    return segments, metrics.drain() if metrics.enabled else None
+
+
+def first_speech(audio, sample_rate, seconds=30):
+    """Up to `seconds` of audio starting at the first detected speech.
+
+    Scans SPEECH_SCAN_SECONDS blocks from the start and stops at the first
+    one with speech, so only a prefix of the recording is read.
+    """
+    block = SPEECH_SCAN_SECONDS * sample_rate
+    for offset in range(0, len(audio), block):
+        regions = vad_filter.detect_speech(audio[offset:offset + block], sample_rate)
+        if regions:
+            start = offset + regions[0][0]
+            return audio[start:start + seconds * sample_rate]
+    return audio[:seconds * sample_rate]
+
+
+class ChunkedTranscriber:
+    """Process pool that transcribes single files split into chunks.
+
+    Every worker loads the model once; use as a context manager so the pool
+    is shut down afterwards.
+    """
+
+    def __init__(self, model_size="base", workers=None, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                 overlap_seconds=DEFAULT_OVERLAP_SECONDS, store=None):
+        self.model_size = model_size
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        ctx = multiprocessing.get_context("spawn")
+        self.pool = ctx.Pool(self.workers, initializer=_init_worker,
+                             initargs=(model_size, threads, metrics.enabled))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def transcribe_audio(self, audio, language=None, translate=False, pcm_path=None):
+        """Transcribe decoded audio; returns a result dict like transcribe_file.
+
+        When audio is mapped from pcm_path, workers map the same file rather
+        than receiving pickled copies of their chunk.
+        """
+        if not language:
+            # Detect once up front so every chunk decodes in the same language
+            language = self.pool.apply(_detect_language, (first_speech(audio, SAMPLE_RATE),))
+
+        options = {"task": "translate" if translate else "transcribe", "language": language}
+        chunks = plan_chunks(audio, SAMPLE_RATE, self.chunk_seconds, self.overlap_seconds)
+        if pcm_path:
+            jobs = [((pcm_path, start, end), options) for start, end in chunks]
+        else:
+            jobs = [(audio[start:end], options) for start, end in chunks]
+        chunk_segments = []
+        for segments, snapshot in self.pool.map(_transcribe_chunk, jobs, chunksize=1):
+            metrics.merge(snapshot)
+            chunk_segments.append(segments)
+
+        segments = stitch_segments([
+            (start / SAMPLE_RATE, end / SAMPLE_RATE, result)
+            for (start, end), result in zip(chunks, chunk_segments)
+        ])
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": language,
+            "duration": len(audio) / SAMPLE_RATE,
+        }
+
+    def transcribe_file(self, file_path, language=None, translate=False, cache=None):
+        key = None
+        if cache is not None:
+            task = "translate" if translate else "transcribe"
+            # Stitched chunks differ from a whole-file run, so they get their own key
+            key = cache.make_key(file_path, self.model_size, language, task, chunked=True)
+            result = cache.get(key)
+            if result is not None:
+                return result
+
+        try:
+            if self.store is not None:
+                audio = self.store.load(file_path)
+                pcm_path = self.store.path_for(file_path)
+            else:
+                audio = transcriber.load_audio(file_path)
+                pcm_path = None
+            result = self.transcribe_audio(audio, language, translate, pcm_path)
+        except Exception as e:
+            raise Exception(f"Transcription failed: {str(e)}")
+
+        if cache is not None:
+            cache.put(key, result)
+        return result
@@ -0,0 +1,448 @@
+"""YouTube audio downloads through yt-dlp"""
+import os
+import re
+import json
+import time
+import tempfile
+import subprocess
+import threading
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import transcriber
+from lru import HitCounter, evict_lru, touch
+from metrics import metrics
+
+# yt-dlp executable; point TRANSCRIBER_YTDLP at a stand-in to run offline
+YTDLP = os.environ.get("TRANSCRIBER_YTDLP", "yt-dlp")
+
+# Marks the metadata line among yt-dlp's messages when streaming to stdout
+META_MARKER = "TRANSCRIBER_META "
+
+DEFAULT_TEMPLATE = "%(title).100s [%(id)s].%(ext)s"
+
+DEFAULT_DOWNLOAD_DIR = os.path.join("cache", "downloads")
+# Size limit for cached downloads, override with TRANSCRIBER_DOWNLOAD_CACHE_MB
+DEFAULT_DOWNLOAD_MB = int(os.environ.get("TRANSCRIBER_DOWNLOAD_CACHE_MB", "2048"))
+# Partial downloads untouched for this long were left by a crashed run
+STALE_PARTIAL_SECONDS = 3600
+
+VIDEO_ID_PATTERN = re.compile(
+    r"(?:youtu\.be/|[?&]v=|/(?:shorts|embed|live|v)/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+
+
+def is_url(source):
+    """True for http(s) URLs and scheme-less YouTube links; an existing
+    local path never counts, whatever its name"""
+    if os.path.exists(source):
+        return False
+    return source.startswith(("http://", "https://")) or extract_video_id(source) is not None
+
+
+def extract_video_id(youtube_url):
+    """The 11 character YouTube video ID in a URL, or None"""
+    match = VIDEO_ID_PATTERN.search(youtube_url)
+    return match.group(1) if match else None
+
+
+def download_audio(youtube_url, output_path="downloads", status_callback=None,
+                   filename_template=DEFAULT_TEMPLATE):
+    """Download the native audio stream from YouTube using yt-dlp.
+
+    The stream is kept as delivered (no MP3 re-encode) and yt-dlp reports the
+    final path itself, so concurrent downloads can't pick up each other's
+    files. Returns (audio_file, title).
+    """
+    if not os.path.exists(output_path):
+        os.makedirs(output_path, exist_ok=True)
+
+    # Create a safer filename template
+    output_template = os.path.join(output_path, filename_template)
+    cmd = [
+        YTDLP,
+        "-f", "bestaudio/best",
+        "-o", output_template,
+        "--no-playlist",
+        "--print", "after_move:%(.{id,title,filepath})j",
+        youtube_url,
+    ]
+
+    if status_callback:
+        status_callback("Downloading audio from YouTube...")
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except OSError as e:
+        raise Exception(f"yt-dlp error: {str(e)}")
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr if e.stderr else str(e)
+        raise Exception(f"yt-dlp error: {error_output}")
+
+    info = _parse_info(result.stdout.splitlines())
+    audio_file = info.get("filepath")
+    if not audio_file or not os.path.exists(audio_file):
+        raise FileNotFoundError("Download failed, yt-dlp did not report an audio file.")
+    return audio_file, info.get("title") or os.path.splitext(os.path.basename(audio_file))[0]
+
+
+def _parse_info(lines):
+    # The JSON line is the last one yt-dlp printed
+    for line in reversed(lines):
+        line = line.strip()
+        if line.startswith(META_MARKER):
+            line = line[len(META_MARKER):]
+        if line.startswith("{"):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    return {}
+
+
+def stream_audio(youtube_url, window_seconds=transcriber.STREAM_WINDOW_SECONDS, info=None,
+                 save_path=None):
+    """Pipe yt-dlp's download straight into ffmpeg and yield decoded float32
+    windows while bytes are still arriving.
+
+    If save_path is given the downloaded bytes are also written there,
+    otherwise nothing touches the disk. If an info dict is given it is filled
+    with the video's id, title, ext and duration before the first window is
+    yielded (when yt-dlp reports them).
+    """
+    if info is None:
+        info = {}
+    ytdlp_cmd = [
+        YTDLP,
+        "-f", "bestaudio/best",
+        "-o", "-",
+        "--no-playlist",
+        "--no-part",
+        # With -o - yt-dlp sends everything but the media to stderr
+        "--print", f"before_dl:{META_MARKER}%(.{{id,title,ext,duration}})j",
+        youtube_url,
+    ]
+    try:
+        ytdlp = subprocess.Popen(ytdlp_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise Exception(f"yt-dlp error: {str(e)}")
+
+    stderr_lines = []
+    meta_ready = threading.Event()
+
+    def read_stderr():
+        for raw in ytdlp.stderr:
+            line = raw.decode(errors="replace").rstrip()
+            stderr_lines.append(line)
+            if line.startswith(META_MARKER):
+                info.update(_parse_info([line]))
+                meta_ready.set()
+        meta_ready.set()
+
+    reader = threading.Thread(target=read_stderr, daemon=True)
+    reader.start()
+
+    pump = None
+    if save_path:
+        # Tee the download into save_path and a pipe feeding ffmpeg
+        read_fd, write_fd = os.pipe()
+        ffmpeg_stdin = os.fdopen(read_fd, "rb")
+
+        def copy_stream():
+            with open(save_path, "wb") as saved, os.fdopen(write_fd, "wb") as sink:
+                for block in iter(lambda: ytdlp.stdout.read(64 * 1024), b""):
+                    saved.write(block)
+                    try:
+                        sink.write(block)
+                    except OSError:
+                        # ffmpeg has gone away; stop downloading
+                        break
+
+        pump = threading.Thread(target=copy_stream, daemon=True)
+        pump.start()
+    else:
+        ffmpeg_stdin = ytdlp.stdout
+
+    windows = transcriber.iter_audio_windows("pipe:0", window_seconds, stdin=ffmpeg_stdin)
+    try:
+        for i, window in enumerate(windows):
+            if i == 0:
+                # ffmpeg is running and owns the read end of the pipe now
+                ffmpeg_stdin.close()
+                meta_ready.wait(timeout=5)
+            yield window
+    except Exception:
+        if ytdlp.wait() != 0:
+            reader.join(timeout=5)
+            raise _ytdlp_error(stderr_lines, ytdlp.returncode)
+        raise
+    finally:
+        # Stops ffmpeg first so the copy thread can't block on a full pipe
+        windows.close()
+        ffmpeg_stdin.close()
+        if ytdlp.poll() is None:
+            ytdlp.kill()
+        ytdlp.wait()
+        if pump is not None:
+            pump.join()
+
+    reader.join(timeout=5)
+    if ytdlp.returncode != 0:
+        raise _ytdlp_error(stderr_lines, ytdlp.returncode)
+
+
+def _ytdlp_error(stderr_lines, returncode):
+    messages = [line for line in stderr_lines if not line.startswith(META_MARKER)][-20:]
+    detail = "\n".join(messages) or f"exited with code {returncode}"
+    return Exception(f"yt-dlp error: {detail}")
+
+
+def stream_transcribe_url(get_model, youtube_url, language=None, translate=False, vad=False,
+                          stats=None, info=None, window_seconds=transcriber.STREAM_WINDOW_SECONDS,
+                          download_cache=None, journal=None, status_callback=None):
+    """Transcribe a YouTube video while it is still downloading, yielding
+    (segment, progress) like transcriber.stream_transcribe.
+
+    With a download_cache the downloaded audio is kept there once the stream
+    completes. With a journal the run is checkpointed, and a resumed run
+    replays the journaled segments, then streams the video from the start
+    again and only transcribes what comes after the last checkpoint.
+    """
+    if info is None:
+        info = {}
+    save_path = download_cache.new_partial() if download_cache is not None else None
+    windows = stream_audio(youtube_url, window_seconds, info, save_path)
+
+    # Start the download before loading the model so the two overlap
+    first = next(windows, None)
+    if first is None:
+        raise Exception("yt-dlp error: no audio received")
+    model = get_model()
+
+    try:
+        if journal is not None and journal.resumed:
+            done = journal.state["window_end"]
+            if status_callback:
+                status_callback(f"Resuming after {transcriber.format_timestamp(done)} "
+                                f"({len(journal.segments)} segments already done)")
+            duration = info.get("duration")
+            progress = min(done / duration, 1.0) if duration else None
+            for segment in journal.segments:
+                yield segment, progress
+        yield from transcriber.stream_segments(model, itertools.chain([first], windows), language,
+                                               translate, info.get("duration"), vad=vad, stats=stats,
+                                               journal=journal)
+        if save_path and info.get("id"):
+            download_cache.add(info["id"], save_path, info.get("title"), info.get("ext"))
+    finally:
+        if save_path and os.path.exists(save_path):
+            os.remove(save_path)
+
+
+class DownloadCache(HitCounter):
+    """Downloaded audio kept on disk and keyed by YouTube video ID.
+
+    Each entry is the audio file plus a small JSON record holding its title.
+    Least recently used entries are removed once the cache exceeds its size
+    limit.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_DOWNLOAD_DIR, max_mb=DEFAULT_DOWNLOAD_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._held = {}  # video ID -> number of holders; never evicted
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._remove_stale_partials()
+
+    def _remove_stale_partials(self):
+        # Downloads in progress are written to all the time, so an old .part
+        # file belongs to a run that died; eviction only looks at records
+        cutoff = time.time() - STALE_PARTIAL_SECONDS
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".part"):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _record_path(self, video_id):
+        return os.path.join(self.cache_dir, f"{video_id}.json")
+
+    def get(self, video_id):
+        """(audio_file, title) for a cached video, or None"""
+        record_path = self._record_path(video_id)
+        try:
+            with open(record_path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        audio_file = os.path.join(self.cache_dir, record["file"])
+        if not os.path.exists(audio_file):
+            return None
+        touch(record_path)
+        return audio_file, record.get("title") or video_id
+
+    def lookup(self, youtube_url):
+        """Like get, counting a hit or miss, for a URL"""
+        video_id = extract_video_id(youtube_url)
+        cached = self.get(video_id) if video_id else None
+        self.count_lookup(bool(cached))
+        return cached
+
+    def fetch(self, youtube_url, status_callback=None, hold=False):
+        """Cached (audio_file, title) for a URL, downloading it on a miss.
+
+        With hold=True the entry can't be evicted until release(youtube_url),
+        so it survives until it has been transcribed.
+        """
+        if hold:
+            self._hold(youtube_url)
+        try:
+            cached = self.lookup(youtube_url)
+            if cached:
+                if status_callback:
+                    status_callback("Using cached download")
+                return cached
+            return self.download(youtube_url, status_callback)
+        except Exception:
+            if hold:
+                self.release(youtube_url)
+            raise
+
+    def download(self, youtube_url, status_callback=None):
+        """Download a URL into the cache without looking it up first (for
+        callers that already counted the lookup); returns (audio_file, title)"""
+        with metrics.span("download", url=youtube_url):
+            audio_file, title = download_audio(youtube_url, self.cache_dir, status_callback,
+                                               filename_template="%(id)s.%(ext)s")
+        video_id = extract_video_id(youtube_url) or Path(audio_file).stem
+        return self.add(video_id, audio_file, title), title
+
+    def _hold(self, youtube_url):
+        video_id = extract_video_id(youtube_url)
+        if video_id:
+            with self._lock:
+                self._held[video_id] = self._held.get(video_id, 0) + 1
+
+    def release(self, youtube_url):
+        """Let a held entry be evicted again"""
+        video_id = extract_video_id(youtube_url)
+        with self._lock:
+            if self._held.get(video_id, 0) > 1:
+                self._held[video_id] -= 1
+            else:
+                self._held.pop(video_id, None)
+
+    def new_partial(self):
+        """Temporary path inside the cache for a download in progress"""
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        os.close(fd)
+        return path
+
+    def add(self, video_id, audio_file, title=None, ext=None):
+        """Move audio_file into the cache under video_id; returns its new path"""
+        if ext is None:
+            ext = os.path.splitext(audio_file)[1].lstrip(".") or "audio"
+        name = f"{video_id}.{ext}"
+        final_path = os.path.join(self.cache_dir, name)
+        if os.path.abspath(audio_file) != os.path.abspath(final_path):
+            os.replace(audio_file, final_path)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"file": name, "title": title}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._record_path(video_id))
+        self.evict(keep=video_id)
+        return final_path
+
+    def _audio_for(self, record_path):
+        with open(record_path, encoding="utf-8") as f:
+            return os.path.join(self.cache_dir, json.load(f)["file"])
+
+    def _remove_entry(self, record_path):
+        audio_file = self._audio_for(record_path)
+        os.remove(record_path)
+        os.remove(audio_file)
+
+    def evict(self, keep=None):
+        """Remove least recently used videos until under the size limit"""
+        with self._lock:
+            kept = [self._record_path(video_id) for video_id in self._held]
+        if keep:
+            kept.append(self._record_path(keep))
+        evict_lru(self.cache_dir, ".json", self.max_bytes, keep=kept,
+                  size_of=lambda record_path: os.path.getsize(self._audio_for(record_path)),
+                  remove=self._remove_entry)
+
+
+class DownloadQueue:
+    """Resolves a list of inputs to local files, downloading URLs up to
+    `prefetch` ahead of the consumer so network I/O overlaps with
+    transcription of earlier items.
+
+    Downloads are held in the cache until the consumer calls release(source)
+    for them, so prefetching more than fits can't evict files that are still
+    waiting to be transcribed. wait_seconds is the time the consumer spent
+    blocked on a download it asked for.
+    """
+
+    def __init__(self, cache, prefetch=2):
+        self.cache = cache
+        self.prefetch = max(1, prefetch)
+        self.urls = 0
+        self.wait_seconds = 0.0
+        self._held = {}  # source -> downloads of it still held in the cache
+
+    def iter_inputs(self, sources):
+        """Yield (source, audio_file, title, error) for each source in order.
+
+        Local paths pass straight through; failed downloads come back with
+        audio_file None and the error message.
+        """
+        sources = iter(sources)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.prefetch) as executor:
+            def fill():
+                while len(pending) < self.prefetch:
+                    source = next(sources, None)
+                    if source is None:
+                        return
+                    if is_url(source):
+                        pending.append((source, executor.submit(self.cache.fetch, source,
+                                                                None, True)))
+                    else:
+                        pending.append((source, None))
+
+            fill()
+            while pending:
+                source, future = pending.popleft()
+                fill()
+                if future is None:
+                    yield source, source, Path(source).stem, None
+                    continue
+
+                self.urls += 1
+                start = time.time()
+                try:
+                    audio_file, title = future.result()
+                    error = None
+                    self._held[source] = self._held.get(source, 0) + 1
+                except Exception as e:
+                    audio_file, title, error = None, None, str(e)
+                self.wait_seconds += time.time() - start
+                yield source, audio_file, title, error
+
+    def release(self, source):
+        """Done with an input yielded by iter_inputs (a no-op for local
+        files and failed downloads)"""
+        if self._held.get(source):
+            self._held[source] -= 1
+            self.cache.release(source)
+
+    def format_stats(self):
+        stats = self.cache.stats()
+        return (f"Downloads: {self.urls} URL(s), cache hit rate {stats['hit_rate']:.0%}, "
+                f"{self.wait_seconds:.1f}s waiting on downloads")
@@ -0,0 +1,174 @@
+"""Write transcript segments to TXT, SRT, WebVTT and JSON files as they arrive"""
+import os
+import json
+
+import transcriber
+from metrics import metrics
+
+FORMATS = ("txt", "srt", "vtt", "json")
+
+
+def format_clock(seconds, separator="."):
+    """HH:MM:SS.mmm (SRT wants "," as separator)"""
+    millis = max(0, int(round(seconds * 1000)))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+
+    def close(self):
+        self.file.close()
+
+
+class TxtWriter(_Writer):
+    """Plain transcript, the same text the app shows"""
+
+    def __init__(self, path, timestamps=False):
+        super().__init__(path)
+        self.timestamps = timestamps
+
+    def write(self, segment):
+        self.file.write(transcriber.format_segment(segment, self.timestamps))
+
+
+class SrtWriter(_Writer):
+    def __init__(self, path):
+        super().__init__(path)
+        self.index = 0
+
+    def write(self, segment):
+        text = segment.get("text", "").strip().replace("-->", "->")
+        if not text:
+            return
+        self.index += 1
+        self.file.write(f"{self.index}\n"
+                        f"{format_clock(segment['start'], ',')} --> "
+                        f"{format_clock(segment['end'], ',')}\n"
+                        f"{text}\n\n")
+
+
+class VttWriter(_Writer):
+    def __init__(self, path):
+        super().__init__(path)
+        self.file.write("WEBVTT\n\n")
+
+    def write(self, segment):
+        text = segment.get("text", "").strip()
+        if not text:
+            return
+        # Cue text may not contain "-->" and treats & and < as markup
+        text = text.replace("&", "&amp;").replace("<", "&lt;").replace("-->", "->")
+        self.file.write(f"{format_clock(segment['start'])} --> "
+                        f"{format_clock(segment['end'])}\n{text}\n\n")
+
+
+class JsonWriter(_Writer):
+    """{"segments": [...]} written one segment at a time"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file.write('{"segments": [')
+        self.count = 0
+
+    def write(self, segment):
+        record = {
+            "id": self.count,
+            "start": round(segment.get("start", 0.0), 3),
+            "end": round(segment.get("end", 0.0), 3),
+            "text": segment.get("text", "").strip(),
+        }
+        if segment.get("words"):
+            record["words"] = [{"word": word["word"],
+                                "start": round(word["start"], 3),
+                                "end": round(word["end"], 3),
+                                "probability": round(word.get("probability", 0.0), 3)}
+                               for word in segment["words"]]
+        self.file.write(("," if self.count else "") + "\n" + json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n]}\n")
+        super().close()
+
+
+def output_paths(title, output_dir="output", formats=("txt",)):
+    """One timestamped path per format, sharing the transcript's file name"""
+    stem = os.path.splitext(transcriber.transcript_path(title, output_dir))[0]
+    return {fmt: f"{stem}.{fmt}" for fmt in formats}
+
+
+class Exporter:
+    """Writes each segment to every requested format in one pass.
+
+    Nothing but the open files is kept, so memory stays flat however long
+    the transcript gets. Use as a context manager, or call close().
+    """
+
+    def __init__(self, paths, timestamps=False):
+        unknown = set(paths) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown export format: {', '.join(sorted(unknown))}")
+        self.paths = dict(paths)
+        self.has_text = False
+        self._writers = []
+        try:
+            for fmt, path in self.paths.items():
+                if fmt == "txt":
+                    self._writers.append(TxtWriter(path, timestamps))
+                else:
+                    self._writers.append({"srt": SrtWriter, "vtt": VttWriter,
+                                          "json": JsonWriter}[fmt](path))
+        except Exception:
+            self.close()
+            raise
+
+    def write(self, segment):
+        self.has_text = self.has_text or bool(segment.get("text", "").strip())
+        for writer in self._writers:
+            writer.write(segment)
+
+    def flush(self):
+        for writer in self._writers:
+            writer.file.flush()
+
+    def close(self):
+        for writer in self._writers:
+            writer.close()
+
+    def remove(self):
+        """Delete the written files (e.g. after an empty transcription)"""
+        for path in self.paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def save_result(result, title, output_dir="output", formats=("txt",), timestamps=False):
+    """Export a finished Whisper result; returns {format: path}.
+
+    Raises if the result holds no text, leaving no files behind.
+    """
+    segments = result.get("segments") or []
+    if not segments and result.get("text", "").strip():
+        # Results without segments still get their text saved
+        segments = [{"start": 0.0, "end": result.get("duration", 0.0), "text": result["text"]}]
+    with metrics.span("write", formats=",".join(formats)), \
+            Exporter(output_paths(title, output_dir, formats), timestamps) as exporter:
+        for segment in segments:
+            exporter.write(segment)
+    if not exporter.has_text:
+        exporter.remove()
+        raise Exception("Transcription returned empty result")
+    return exporter.paths
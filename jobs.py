@@ -0,0 +1,181 @@
+"""Durable transcription job queue stored in SQLite"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = os.path.join("output", "jobs.db")
+
+PRIORITIES = {"High": 10, "Normal": 0, "Low": -10}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    error TEXT,
+    output_file TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, priority DESC, id);
+"""
+
+
+class JobQueue:
+    """Jobs move from queued to running to done, or back to queued on a
+    failure until max_attempts is used up, then to failed.
+
+    Jobs left running by a process that exited are queued again when the
+    queue is opened, so they resume on the next start.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.resumed = self._requeue_interrupted()
+
+    def _requeue_interrupted(self):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'queued', updated = ? WHERE state = 'running'",
+                (time.time(),))
+            return cursor.rowcount
+
+    def enqueue(self, kind, source, settings, priority=0, max_attempts=3):
+        """Add a job and return its id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, source, settings, priority, max_attempts, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, source, json.dumps(settings), priority, max_attempts, now, now))
+            return cursor.lastrowid
+
+    def claim(self):
+        """Mark the highest priority queued job as running and return it"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE state = 'queued' "
+                    "ORDER BY priority DESC, id LIMIT 1").fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated = ? "
+                    "WHERE id = ?", (time.time(), row["id"]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._to_dict(row)
+        job["attempts"] += 1
+        job["state"] = "running"
+        return job
+
+    def complete(self, job_id, output_file):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'done', output_file = ?, error = NULL, updated = ? "
+                "WHERE id = ?", (output_file, time.time(), job_id))
+
+    def fail(self, job_id, error):
+        """Record a failure; returns True if the job will be retried"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            retry = row is not None and row["attempts"] < row["max_attempts"]
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated = ? WHERE id = ?",
+                ("queued" if retry else "failed", error, time.time(), job_id))
+            return retry
+
+    def list_jobs(self, limit=100):
+        """Most recent jobs first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running')").fetchone()[0]
+
+    def _to_dict(self, row):
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        return job
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobScheduler(threading.Thread):
+    """Background thread that drains a JobQueue one job at a time.
+
+    run_job(job) does the work and returns the output file; exceptions mark
+    the job failed (and possibly queued for retry). on_start(job),
+    on_done(job, output) and on_error(job, message, retry) are called from
+    this thread.
+    """
+
+    def __init__(self, queue, run_job, on_start=None, on_done=None, on_error=None,
+                 poll_interval=5.0):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.run_job = run_job
+        self.on_start = on_start
+        self.on_done = on_done
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.current_job = None
+
+    def wake(self):
+        """Check the queue now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            self.current_job = job
+            if self.on_start:
+                self.on_start(job)
+            try:
+                output = self.run_job(job)
+            except Exception as e:
+                message = str(e)
+                retry = self.queue.fail(job["id"], message)
+                if self.on_error:
+                    self.on_error(job, message, retry)
+            else:
+                self.queue.complete(job["id"], output)
+                if self.on_done:
+                    self.on_done(job, output)
+            finally:
+                self.current_job = None
@@ -0,0 +1,189 @@
+"""Append-only journals that let a long transcription resume after a crash"""
+import os
+import json
+import time
+
+from metrics import metrics
+
+DEFAULT_JOURNAL_DIR = os.path.join("output", "journals")
+# Jobs without live output on audio at least this long are transcribed
+# window by window with a journal too; override with TRANSCRIBER_JOURNAL_MIN_SECONDS
+MIN_SECONDS = float(os.environ.get("TRANSCRIBER_JOURNAL_MIN_SECONDS", "600"))
+
+
+def job_journal_path(job_id, journal_dir=DEFAULT_JOURNAL_DIR):
+    return os.path.join(journal_dir, f"job_{job_id}.jsonl")
+
+
+def source_header(file_path, model_size, language=None, translate=False, vad=False,
+                  window_seconds=None):
+    """What a journal was written for; a journal with another header is
+    started over instead of resumed"""
+    header = url_header(os.path.abspath(file_path), model_size, language, translate, vad,
+                        window_seconds)
+    header["size"] = os.path.getsize(file_path)
+    header["mtime"] = os.path.getmtime(file_path)
+    return header
+
+
+def url_header(youtube_url, model_size, language=None, translate=False, vad=False,
+               window_seconds=None):
+    """Header for a video transcribed while it streams; a resumed stream is
+    decoded again from the start, so the URL identifies the audio"""
+    return {
+        "source": youtube_url,
+        "model": model_size,
+        "language": language,
+        "translate": translate,
+        "vad": vad,
+        "window_seconds": window_seconds,
+    }
+
+
+def discard(job_id, journal_dir=DEFAULT_JOURNAL_DIR):
+    """Delete the journal of a job that won't run again"""
+    try:
+        os.remove(job_journal_path(job_id, journal_dir))
+    except OSError:
+        pass
+
+
+def _remove_outputs(paths):
+    # Half-written outputs of a run that never reached a checkpoint
+    for path in paths.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _plain(value):
+    # numpy scalars in Whisper segments
+    return value.item()
+
+
+class Journal:
+    """JSON lines of finished segments, each batch followed by a checkpoint
+    holding the decoder state needed to carry on after it.
+
+    Opening an existing journal with the same header recovers it: segments
+    and outputs up to the last checkpoint are kept in .segments, .outputs and
+    .state, and anything written after that checkpoint (including a line cut
+    short by a crash) is truncated away. Output files recorded after the last
+    checkpoint are deleted, since the job starts them over under new names.
+    Checkpoints and outputs are flushed and synced to disk; segment lines are
+    only buffered until the next checkpoint.
+    """
+
+    def __init__(self, path, header):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.header = header
+        self.segments = []
+        self.outputs = None
+        self.state = None
+        self.checkpoints = 0
+        self.bytes = 0
+        self.write_seconds = 0.0
+        self._counted_bytes = 0
+
+        valid_end = self._recover()
+        self._file = open(path, "r+b" if valid_end else "wb")
+        self._file.seek(valid_end)
+        self._file.truncate()
+        if not valid_end:
+            self._write({"header": header})
+            self._sync()
+
+    @property
+    def resumed(self):
+        return self.state is not None
+
+    def _recover(self):
+        # Byte offset just past the last usable line, or 0 to start over
+        if not os.path.exists(self.path):
+            return 0
+        segments, outputs = [], None
+        valid_end = 0
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not valid_end:
+                    if record.get("header") != self.header:
+                        return 0
+                    valid_end = offset
+                elif "segment" in record:
+                    segments.append(record["segment"])
+                elif "outputs" in record:
+                    outputs = record["outputs"]
+                elif "checkpoint" in record:
+                    self.segments = list(segments)
+                    self.outputs = outputs
+                    self.state = record["checkpoint"]
+                    valid_end = offset
+        if outputs and self.outputs is None:
+            _remove_outputs(outputs)
+        return valid_end
+
+    def _write(self, record):
+        start = time.perf_counter()
+        line = (json.dumps(record, ensure_ascii=False, default=_plain) + "\n").encode("utf-8")
+        self._file.write(line)
+        self.bytes += len(line)
+        self.write_seconds += time.perf_counter() - start
+
+    def _sync(self):
+        start = time.perf_counter()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        seconds = time.perf_counter() - start
+        self.write_seconds += seconds
+        metrics.observe("journal_sync_seconds", seconds)
+
+    def record_outputs(self, paths):
+        """Output files of the job, so a resumed run rewrites the same ones.
+        Call before creating them: the record is synced so a crash before
+        the first checkpoint can't leave files the journal doesn't know."""
+        self.outputs = dict(paths)
+        self._write({"outputs": self.outputs})
+        self._sync()
+
+    def append_segment(self, segment):
+        self._write({"segment": segment})
+
+    def checkpoint(self, state):
+        """Mark every segment appended so far as done; state is what
+        transcriber.stream_segments needs to continue from here"""
+        self._write({"checkpoint": state})
+        self._sync()
+        self.checkpoints += 1
+        metrics.count("journal_bytes", self.bytes - self._counted_bytes)
+        self._counted_bytes = self.bytes
+
+    def stats(self):
+        return {"checkpoints": self.checkpoints, "bytes": self.bytes,
+                "write_seconds": self.write_seconds}
+
+    def format_stats(self, wall_seconds=None):
+        text = (f"journal: {self.checkpoints} checkpoints, {self.bytes / 1024:.0f} KB, "
+                f"{self.write_seconds * 1000:.0f} ms")
+        if wall_seconds:
+            text += f" ({self.write_seconds / wall_seconds:.2%} of run time)"
+        return text
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def remove(self):
+        """Close and delete the journal once its job is done"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,122 @@
+"""Fast language detection with a small model, cached per source file"""
+import os
+import hashlib
+import threading
+
+import transcriber
+import chunking
+from cache import TranscriptCache, file_digest
+
+SAMPLE_RATE = transcriber.SAMPLE_RATE
+
+DETECT_MODEL = "tiny"
+# Seconds of speech the detector listens to
+VOICED_SECONDS = 10
+# Without an audio store only this much of the file is decoded to look for speech
+PROBE_SECONDS = 120
+# Detections below this probability are left to the main model, override
+# with TRANSCRIBER_LANGUAGE_THRESHOLD
+DEFAULT_THRESHOLD = float(os.environ.get("TRANSCRIBER_LANGUAGE_THRESHOLD", "0.7"))
+DEFAULT_CACHE_DIR = os.path.join("cache", "languages")
+# Number of runner-up languages kept with each detection
+TOP_LANGUAGES = 5
+
+
+def detect(model, audio, seconds=VOICED_SECONDS):
+    """Language probabilities for the first `seconds` of speech in audio.
+
+    Returns {"language", "probability", "scores"}, where scores holds the
+    TOP_LANGUAGES most likely languages.
+    """
+    import whisper
+    clip = chunking.first_speech(audio, SAMPLE_RATE, seconds)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), model.dims.n_mels)
+    _, probs = model.detect_language(mel.to(model.device))
+    ranked = sorted(probs.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "language": ranked[0][0],
+        "probability": float(ranked[0][1]),
+        "scores": {code: float(p) for code, p in ranked[:TOP_LANGUAGES]},
+    }
+
+
+class LanguageDetector:
+    """Detects the spoken language with its own small model before the main
+    model is involved.
+
+    Detections are cached on disk by the source's content hash, so running
+    the same file again (with any model or settings) skips detection. Safe to
+    share between threads; the detection model is loaded on first use.
+    """
+
+    def __init__(self, model_size=DETECT_MODEL, threshold=DEFAULT_THRESHOLD,
+                 cache_dir=DEFAULT_CACHE_DIR, store=None, loader=transcriber.load_model):
+        self.model_size = model_size
+        self.threshold = threshold
+        self.store = store
+        self.cache = TranscriptCache(cache_dir) if cache_dir else None
+        self._loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _key(self, file_path, digest=None):
+        import whisper
+        parts = [digest or file_digest(file_path), self.model_size, str(VOICED_SECONDS),
+                 whisper.__version__]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _load_audio(self, file_path):
+        if self.store is not None:
+            return self.store.load(file_path)
+        # The speech we need is near the start; don't decode the whole file
+        windows = transcriber.iter_audio_windows(file_path, PROBE_SECONDS)
+        try:
+            return next(windows)
+        finally:
+            windows.close()
+
+    def detect(self, file_path, digest=None):
+        """Detection for file_path as returned by detect(), from the cache if
+        possible. digest is the file_digest of file_path, when already known."""
+        key = None
+        if self.cache is not None:
+            key = self._key(file_path, digest)
+            detection = self.cache.get(key)
+            if detection is not None:
+                return detection
+
+        audio = self._load_audio(file_path)
+        with self._lock:
+            if self._model is None:
+                self._model = self._loader(self.model_size)
+            detection = detect(self._model, audio)
+        if self.cache is not None:
+            self.cache.put(key, detection)
+        return detection
+
+    def resolve(self, file_path, status_callback=None, digest=None):
+        """Language code to pass to the main model, or None to let it detect.
+
+        Detection failures are reported and fall back to None rather than
+        failing the transcription.
+        """
+        if status_callback:
+            status_callback("Detecting language...")
+        try:
+            detection = self.detect(file_path, digest)
+        except Exception as e:
+            if status_callback:
+                status_callback(f"Language detection failed ({str(e)}), model will detect it")
+            return None
+
+        from whisper.tokenizer import LANGUAGES
+        language = detection["language"]
+        name = LANGUAGES.get(language, language).title()
+        if detection["probability"] < self.threshold:
+            if status_callback:
+                status_callback(f"Language unclear ({name} {detection['probability']:.0%}), "
+                                f"model will detect it")
+            return None
+        if status_callback:
+            status_callback(f"Detected {name} ({detection['probability']:.0%})")
+        return language
@@ -0,0 +1,177 @@
+"""Low-RSS model loading: memory-mapped checkpoints with weights used in place
+
+torch.load(mmap=True) maps the checkpoint file instead of reading it, and
+load_state_dict(assign=True) makes those mapped tensors the model's weights,
+so there is no second in-memory copy while loading. Pages are read from the
+OS page cache on first use, and worker processes mapping the same file share
+them. Needs torch 2.1 or newer.
+"""
+import os
+import sys
+import tempfile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "models")
+
+
+def reset_peak():
+    """Restart the peak RSS count so the next memory_usage() peak covers
+    only what happens from here on (Linux only; elsewhere a no-op)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def memory_usage():
+    """Resident memory of this process in MB: current, peak and the part
+    backed by files (shared with other processes mapping the same files).
+    Values the platform doesn't report are None."""
+    fields = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM", "RssFile"):
+                    fields[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+
+    peak = fields.get("VmHWM")
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"rss_mb": fields.get("VmRSS"), "peak_rss_mb": peak, "shared_mb": fields.get("RssFile")}
+
+
+def format_memory(usage):
+    if usage.get("rss_mb") is None:
+        return f"peak RSS {usage['peak_rss_mb']:.0f} MB" if usage.get("peak_rss_mb") else "RSS n/a"
+    text = f"RSS {usage['rss_mb']:.0f} MB"
+    details = []
+    if usage.get("peak_rss_mb") is not None:
+        details.append(f"peak {usage['peak_rss_mb']:.0f} MB")
+    if usage.get("shared_mb") is not None:
+        details.append(f"{usage['shared_mb']:.0f} MB shared")
+    return text + (f" ({', '.join(details)})" if details else "")
+
+
+def checkpoint_path(model_size, download_root=None):
+    """Path of the official checkpoint for model_size, downloading it like
+    whisper.load_model would; a path to a .pt file is returned as is"""
+    import whisper
+    if os.path.isfile(model_size):
+        return model_size
+    if model_size not in whisper._MODELS:
+        raise Exception(f"Unknown model '{model_size}'")
+    if download_root is None:
+        default = os.path.join(os.path.expanduser("~"), ".cache")
+        download_root = os.path.join(os.getenv("XDG_CACHE_HOME", default), "whisper")
+    return whisper._download(whisper._MODELS[model_size], download_root, False)
+
+
+def _skeleton(dims):
+    # Module tree without allocating any weights
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+    with torch.device("meta"):
+        return Whisper(ModelDimensions(**dims))
+
+
+def _bf16_keys(model):
+    """State dict keys that can be stored as bf16.
+
+    whisper's Linear and Conv1d cast their weights to the input's dtype in
+    forward, so activations stay fp32. Embeddings and layer norms don't and
+    are kept fp32. The cast makes a temporary fp32 copy of every weight on
+    each forward pass, so bf16 trades speed for memory.
+    """
+    from whisper.model import Conv1d, Linear
+    keys = set()
+    for name, module in model.named_modules():
+        if isinstance(module, (Linear, Conv1d)):
+            keys.update(f"{name}.{param}" for param, _ in module.named_parameters(recurse=False))
+    return keys
+
+
+def _map_checkpoint(path):
+    import torch
+    try:
+        return torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except TypeError:
+        raise Exception("Memory-mapped loading needs torch 2.1 or newer")
+
+
+def bf16_path(model_size, cache_dir=DEFAULT_CACHE_DIR):
+    import whisper
+    name = os.path.splitext(os.path.basename(model_size))[0]
+    return os.path.join(cache_dir, f"{name}-bf16-whisper{whisper.__version__}.pt")
+
+
+def convert_bf16(source, destination):
+    """Write a copy of the checkpoint at source with its linear and
+    convolution weights stored as bf16"""
+    import torch
+    checkpoint = _map_checkpoint(source)
+    keys = _bf16_keys(_skeleton(checkpoint["dims"]))
+    # One tensor at a time: the fp32 pages are only read from the mapping
+    state = {key: value.to(torch.bfloat16) if key in keys else value
+             for key, value in checkpoint["model_state_dict"].items()}
+
+    directory = os.path.dirname(destination) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        torch.save({"dims": checkpoint["dims"], "model_state_dict": state}, tmp_path)
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _restore_buffers(model, dims):
+    # Buffers whisper computes in __init__ instead of saving; the skeleton
+    # only has meta placeholders for them
+    import numpy as np
+    import torch
+    n_ctx = dims["n_text_ctx"]
+    model.decoder.register_buffer(
+        "mask", torch.empty(n_ctx, n_ctx).fill_(-np.inf).triu_(1), persistent=False)
+    heads = torch.zeros(dims["n_text_layer"], dims["n_text_head"], dtype=torch.bool)
+    heads[dims["n_text_layer"] // 2:] = True
+    model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+
+
+def load_mmap(model_size, dtype="fp32", cache_dir=DEFAULT_CACHE_DIR, download_root=None):
+    """Whisper model whose weights live in a memory-mapped checkpoint.
+
+    dtype "bf16" maps a bf16 copy of the checkpoint instead, converted once
+    into cache_dir, which halves the memory of the linear layers.
+    """
+    import whisper
+
+    path = checkpoint_path(model_size, download_root)
+    if dtype == "bf16":
+        converted = bf16_path(model_size, cache_dir)
+        if not os.path.exists(converted):
+            convert_bf16(path, converted)
+        path = converted
+
+    checkpoint = _map_checkpoint(path)
+    model = _skeleton(checkpoint["dims"])
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    _restore_buffers(model, checkpoint["dims"])
+    if model_size in whisper._ALIGNMENT_HEADS:
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_size])
+
+    for name, tensor in list(model.named_parameters()) + list(model.named_buffers()):
+        if tensor.is_meta:
+            raise Exception(f"Checkpoint {path} has no value for {name}")
+    return model.eval()
@@ -0,0 +1,72 @@
+"""Shared pieces of the on-disk caches: LRU eviction by modification time and hit counting"""
+import os
+import threading
+
+
+def touch(path):
+    """Mark path as just used; eviction goes by modification time"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(directory, suffix, max_bytes, keep=(), size_of=os.path.getsize, remove=os.remove):
+    """Delete the least recently used entries ending in suffix from directory
+    until the rest fit in max_bytes.
+
+    keep holds entry paths that are never deleted (e.g. the one just added).
+    size_of(path) and remove(path) let one entry stand for several files.
+    Entries that can't be read or removed (still mapped by another process
+    on some platforms) are skipped.
+    """
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(suffix):
+            continue
+        try:
+            used = entry.stat().st_mtime
+            size = size_of(entry.path)
+        except (OSError, ValueError, KeyError):
+            continue
+        entries.append((used, size, entry.path))
+        total += size
+
+    entries.sort()
+    keep = {os.path.abspath(path) for path in keep}
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            remove(path)
+            total -= size
+        except (OSError, ValueError, KeyError):
+            pass
+
+
+class HitCounter:
+    """Mixin keeping the hits and misses of a cache and reporting them from
+    stats(); safe to update from several threads"""
+
+    hits = 0
+    misses = 0
+    _counter_lock = threading.Lock()
+
+    def count_lookup(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._counter_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
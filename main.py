@@ -1,29 +1,87 @@
-import whisper
 import os
 import sys
-import subprocess
-import glob
+import json
+import argparse
+import importlib.util
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import threading
 from pathlib import Path
 import time
+import threading
+
+import transcriber
+import downloads
+import batch
+import bench
+import export
+import server
+import search
+from models import ModelRegistry
+from cache import TranscriptCache
+from audio_store import AudioStore
+from langid import LanguageDetector
+from metrics import metrics
+from jobs import JobQueue, JobScheduler, PRIORITIES
+import journal
+import vad
+
+# Set to "0" to skip loading the selected model right after startup
+WARMUP = os.environ.get("TRANSCRIBER_WARMUP", "1") != "0"
+# Set by the startup benchmark (see bench.measure_startup)
+STARTUP_PROBE_ENV = bench.STARTUP_PROBE_ENV
 
 class TranscriberGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Multi-Language Audio Transcriber")
-        self.root.geometry("700x600")
+        self.root.geometry("780x860")
         self.root.resizable(True, True)
         
         # Variables
-        self.whisper_model = None
-        self.current_model_name = None
+        self.models = ModelRegistry()
+        self.transcript_cache = TranscriptCache()
+        self.audio_store = AudioStore()
+        self.language_detector = LanguageDetector(store=self.audio_store)
+        self.download_cache = downloads.DownloadCache()
+        for name, component in (("models", self.models),
+                                ("transcript_cache", self.transcript_cache),
+                                ("audio_store", self.audio_store),
+                                ("download_cache", self.download_cache),
+                                ("language_cache", self.language_detector.cache)):
+            metrics.register(name, component.stats)
         self.is_transcribing = False
         self.start_time = None
+        self.vad_summary = None
+        self.journal_summary = None
+        self.last_segments = []
+        self.search_index = search.SearchIndex()
         
         self.setup_ui()
         
+        # Pick up transcripts saved by batch runs or older versions
+        threading.Thread(target=self.search_index.sync, daemon=True).start()
+        
+        # Jobs left unfinished by a previous run are queued again by JobQueue
+        self.job_queue = JobQueue()
+        self.scheduler = JobScheduler(
+            self.job_queue, self.transcription_worker,
+            on_start=lambda job: self.root.after(0, lambda: self.job_started(job)),
+            on_done=lambda job, output: self.root.after(
+                0, lambda: self.transcription_complete(job, output)),
+            on_error=lambda job, message, retry: self.root.after(
+                0, lambda: self.transcription_error(job, message, retry)))
+        self.refresh_jobs()
+        if self.job_queue.resumed:
+            self.update_status(f"Resuming {self.job_queue.resumed} unfinished job(s)...")
+        self.scheduler.start()
+        
+        # whisper and torch take seconds to import; do it behind the open window
+        self.startup_times = {}
+        self.engine_ready = False
+        self.transcribe_button.config(text="Start Transcription (loading engine...)")
+        threading.Thread(target=self.load_engine, args=(self.get_model_code(),),
+                         daemon=True).start()
+        
     def setup_ui(self):
         # Main frame
         main_frame = ttk.Frame(self.root, padding="20")
@@ -125,10 +183,20 @@ class TranscriberGUI:
                                        state="readonly", width=25)
         self.model_combo.grid(row=0, column=3, sticky=(tk.W))
         self.model_combo.set("Base (recommended)")
+        self.model_combo.bind("<<ComboboxSelected>>", self.on_model_change)
+        
+        # int8 runs the linear layers quantized: faster on CPU, slightly less accurate
+        ttk.Label(settings_frame, text="Backend:").grid(row=0, column=4, sticky=tk.W, padx=(20, 10))
+        self.backend_var = tk.StringVar(value="fp32")
+        self.backend_combo = ttk.Combobox(settings_frame, textvariable=self.backend_var,
+                                          values=list(transcriber.BACKENDS),
+                                          state="readonly", width=6)
+        self.backend_combo.grid(row=0, column=5, sticky=(tk.W))
+        self.backend_combo.bind("<<ComboboxSelected>>", self.on_model_change)
         
         # Additional options
         options_frame = ttk.Frame(settings_frame)
-        options_frame.grid(row=1, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(10, 0))
+        options_frame.grid(row=1, column=0, columnspan=6, sticky=(tk.W, tk.E), pady=(10, 0))
         
         self.translate_var = tk.BooleanVar()
         ttk.Checkbutton(options_frame, text="Translate to English", 
@@ -136,7 +204,30 @@ class TranscriberGUI:
         
         self.timestamps_var = tk.BooleanVar()
         ttk.Checkbutton(options_frame, text="Include timestamps", 
-                       variable=self.timestamps_var).grid(row=0, column=1, sticky=tk.W)
+                       variable=self.timestamps_var).grid(row=0, column=1, sticky=tk.W, padx=(0, 20))
+        
+        self.stream_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Live output", 
+                       variable=self.stream_var).grid(row=0, column=2, sticky=tk.W, padx=(0, 20))
+        
+        self.vad_var = tk.BooleanVar()
+        ttk.Checkbutton(options_frame, text="Skip silence", 
+                       variable=self.vad_var).grid(row=0, column=3, sticky=tk.W)
+        
+        # Extra formats written next to the .txt transcript
+        formats_frame = ttk.Frame(options_frame)
+        formats_frame.grid(row=1, column=2, columnspan=2, sticky=tk.W, pady=(10, 0))
+        ttk.Label(formats_frame, text="Also save:").pack(side=tk.LEFT, padx=(0, 5))
+        self.format_vars = {}
+        for fmt in export.FORMATS[1:]:
+            self.format_vars[fmt] = tk.BooleanVar()
+            ttk.Checkbutton(formats_frame, text=fmt.upper(),
+                           variable=self.format_vars[fmt]).pack(side=tk.LEFT, padx=(0, 5))
+        
+        ttk.Label(options_frame, text="Priority:").grid(row=1, column=0, sticky=tk.W, pady=(10, 0))
+        self.priority_var = tk.StringVar(value="Normal")
+        ttk.Combobox(options_frame, textvariable=self.priority_var, values=list(PRIORITIES),
+                     state="readonly", width=10).grid(row=1, column=1, sticky=tk.W, pady=(10, 0))
         
         # Transcribe button
         self.transcribe_button = ttk.Button(main_frame, text="Start Transcription", 
@@ -184,6 +275,71 @@ class TranscriberGUI:
                                      command=self.copy_transcript, state="disabled")
         self.copy_button.grid(row=0, column=1)
         
+        # Job queue
+        jobs_frame = ttk.LabelFrame(main_frame, text="Jobs", padding="10")
+        jobs_frame.grid(row=8, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        jobs_frame.columnconfigure(0, weight=1)
+        
+        columns = ("id", "state", "model", "attempts", "source")
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=columns, show="headings", height=4)
+        for column, width in zip(columns, (40, 70, 60, 60, 360)):
+            self.jobs_tree.heading(column, text=column.capitalize())
+            self.jobs_tree.column(column, width=width, stretch=(column == "source"))
+        self.jobs_tree.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        # Search over saved transcripts
+        search_frame = ttk.LabelFrame(main_frame, text="Search Transcripts", padding="10")
+        search_frame.grid(row=9, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        search_frame.columnconfigure(0, weight=1)
+        
+        self.search_entry = ttk.Entry(search_frame)
+        self.search_entry.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        self.search_entry.bind("<Return>", lambda event: self.run_search())
+        ttk.Button(search_frame, text="Search", command=self.run_search).grid(row=0, column=1, padx=(5, 0))
+        
+        columns = ("time", "file", "text")
+        self.search_tree = ttk.Treeview(search_frame, columns=columns, show="headings", height=4)
+        for column, width in zip(columns, (60, 160, 370)):
+            self.search_tree.heading(column, text=column.capitalize())
+            self.search_tree.column(column, width=width, stretch=(column == "text"))
+        self.search_tree.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.search_tree.bind("<Double-1>", self.open_search_hit)
+        self.search_hits = {}
+        
+    def load_engine(self, model_size):
+        """Import the inference stack, then warm up the selected model"""
+        start = time.perf_counter()
+        try:
+            import whisper  # noqa: F401 - imports torch too
+        except ImportError as e:
+            self.root.after(0, lambda: self.update_status(
+                f"❌ whisper not installed ({e}). Run: pip install openai-whisper"))
+            return
+        self.startup_times["import_seconds"] = time.perf_counter() - start
+        self.startup_times["engine_ready"] = time.time()
+        self.root.after(0, self.engine_loaded)
+        if WARMUP and not os.environ.get(STARTUP_PROBE_ENV):
+            self.models.preload(model_size)
+    
+    def engine_loaded(self):
+        self.engine_ready = True
+        self.transcribe_button.config(text="Start Transcription")
+        if not self.is_transcribing:
+            self.update_status(f"Ready (engine loaded in {self.startup_times['import_seconds']:.1f}s)")
+        
+        launched = os.environ.get(STARTUP_PROBE_ENV)
+        if launched:
+            launched = float(launched)
+            # The engine can beat the first paint when imports are cached
+            first_paint = self.startup_times.get("first_paint", time.time())
+            print(json.dumps({
+                "first_paint": first_paint - launched,
+                "engine_ready": self.startup_times["engine_ready"] - launched,
+                "import_seconds": self.startup_times["import_seconds"],
+            }), flush=True)
+            self.scheduler.stop()
+            self.root.destroy()
+    
     def on_input_method_change(self):
         if self.input_method.get() == "youtube":
             self.url_entry.config(state="normal")
@@ -194,6 +350,14 @@ class TranscriberGUI:
             self.file_entry.config(state="normal")
             self.browse_button.config(state="normal")
     
+    def on_model_change(self, event=None):
+        # Start loading the chosen model before the user presses Start
+        model_size = self.get_model_code()
+        if not self.models.is_loaded(model_size):
+            self.models.preload(model_size)
+            if not self.is_transcribing:
+                self.update_status(f"Preloading model '{model_size}' in background...")
+    
     def clear_url_placeholder(self, event):
         if self.url_entry.get() == "Paste YouTube URL here...":
             self.url_entry.delete(0, tk.END)
@@ -239,7 +403,7 @@ class TranscriberGUI:
             "Medium (high quality)": "medium",
             "Large (best quality)": "large"
         }
-        return model_mapping.get(selection, "base")
+        return transcriber.model_name(model_mapping.get(selection, "base"), self.backend_var.get())
     
     def update_status(self, message):
         self.status_label.config(text=message)
@@ -255,92 +419,106 @@ class TranscriberGUI:
         else:
             self.timer_label.config(text="")
     
-    def download_audio(self, youtube_url, output_path="downloads"):
-        """Download audio from YouTube using yt-dlp"""
-        if not os.path.exists(output_path):
-            os.makedirs(output_path)
-
-        # Create a safer filename template
-        output_template = os.path.join(output_path, "%(title).100s.%(ext)s")
-        cmd = [
-            "yt-dlp",
-            "-f", "bestaudio/best",
-            "--extract-audio",
-            "--audio-format", "mp3",
-            "-o", output_template,
-            "--no-playlist",
-            youtube_url,
-        ]
-
-        self.update_status("Downloading audio from YouTube...")
-        try:
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            
-            # Find the downloaded MP3 file
-            mp3_files = glob.glob(os.path.join(output_path, "*.mp3"))
-            if mp3_files:
-                audio_file = max(mp3_files, key=os.path.getctime)  # Get newest file
-                title = os.path.splitext(os.path.basename(audio_file))[0]
-                return audio_file, title
-            else:
-                raise FileNotFoundError("Download failed, no MP3 file found.")
-                
-        except subprocess.CalledProcessError as e:
-            error_output = e.stderr.decode() if e.stderr else str(e)
-            raise Exception(f"yt-dlp error: {error_output}")
+    def download_audio(self, youtube_url):
+        """Download audio from YouTube using yt-dlp into the download cache
+        (after transcription_worker found it missing there)"""
+        return self.download_cache.download(youtube_url, self.update_status)
     
-    def transcribe_audio(self, file_path, model_size="base", language=None):
-        """Transcribe audio file using Whisper - simplified approach"""
+    def get_model(self, model_size):
         self.update_status(f"Loading Whisper model '{model_size}'...")
         
-        # Load model if needed
-        if self.whisper_model is None or self.current_model_name != model_size:
-            try:
-                self.whisper_model = whisper.load_model(model_size)
-                self.current_model_name = model_size
-                self.update_status(f"Model '{model_size}' loaded successfully")
-            except Exception as e:
-                raise Exception(f"Failed to load model: {str(e)}")
+        # Reuse a cached model or wait for it to load
+        model = self.models.get(model_size)
+        self.update_status(f"Model '{model_size}' ready ({self.models.format_stats(model_size)})")
         
         self.update_status("Transcribing audio... Please wait.")
+        return model
+    
+    def transcribe_audio(self, file_path, model_size, language, settings):
+        """Transcribe audio file using Whisper - simplified approach"""
+        self.update_status("Checking transcript cache...")
+        result = transcriber.transcribe_cached(lambda: self.get_model(model_size),
+                                               file_path, model_size, language,
+                                               translate=settings["translate"],
+                                               cache=self.transcript_cache,
+                                               status_callback=self.update_status,
+                                               vad=settings["vad"],
+                                               store=self.audio_store,
+                                               detector=self.language_detector)
+        metrics.count("audio_seconds", result["duration"])
+        if "speech_duration" in result:
+            self.vad_summary = vad.format_speedup(result["duration"], result["speech_duration"])
+        return result
+    
+    def journaled_transcription(self, job_journal, segments, get_title, output_dir,
+                                timestamps, formats):
+        """stream_transcription for a journaled job; the journal is deleted once
+        the job is done and kept for a retry when it fails"""
+        start = time.time()
+        try:
+            output_file = self.stream_transcription(segments, get_title, output_dir, timestamps,
+                                                    formats, job_journal)
+        finally:
+            job_journal.close()
+        if job_journal.checkpoints:
+            self.journal_summary = job_journal.format_stats(time.time() - start)
+        job_journal.remove()
+        return output_file
+    
+    def stream_transcription(self, segments, get_title, output_dir, timestamps=False,
+                             formats=("txt",), job_journal=None):
+        """Write (segment, progress) pairs to the output files and the text box
+        as soon as each is ready. The files are named after get_title() once the
+        first segment arrives, or reused from job_journal when resuming. Returns
+        the path of the first format."""
+        exporter = None
         
         try:
-            # Simple transcription with minimal options for reliability
-            transcribe_options = {
-                "verbose": False,
-                "task": "translate" if self.translate_var.get() else "transcribe",
-            }
-            
-            # Only set language if not auto-detect
-            if language:
-                transcribe_options["language"] = language
-            
-            result = self.whisper_model.transcribe(file_path, **transcribe_options)
-            
-            if self.timestamps_var.get():
-                # Format with timestamps
-                formatted_text = ""
-                if "segments" in result:
-                    for segment in result["segments"]:
-                        start = segment.get("start", 0)
-                        end = segment.get("end", 0)
-                        text = segment.get("text", "").strip()
-                        start_time = f"{int(start//60):02d}:{int(start%60):02d}"
-                        end_time = f"{int(end//60):02d}:{int(end%60):02d}"
-                        formatted_text += f"[{start_time} - {end_time}] {text}\n"
-                    return formatted_text if formatted_text else result["text"]
-                else:
-                    return result["text"]
-            else:
-                return result["text"]
-                
-        except Exception as e:
-            raise Exception(f"Transcription failed: {str(e)}")
+            with metrics.span("stream"):
+                for segment, progress in segments:
+                    if exporter is None:
+                        if job_journal is not None and job_journal.outputs:
+                            paths = job_journal.outputs
+                        else:
+                            paths = export.output_paths(get_title(), output_dir, formats)
+                            if job_journal is not None:
+                                job_journal.record_outputs(paths)
+                        exporter = export.Exporter(paths, timestamps)
+                    with metrics.span("write", streamed=True):
+                        exporter.write(segment)
+                        exporter.flush()
+                    self.keep_segment(segment)
+                    text = transcriber.format_segment(segment, timestamps)
+                    self.root.after(0, lambda t=text, p=progress: self.show_segment(t, p))
+        finally:
+            if exporter is not None:
+                exporter.close()
+        
+        if exporter is None or not exporter.has_text:
+            if exporter is not None:
+                exporter.remove()
+            raise Exception("Transcription returned empty result")
+        return exporter.paths[formats[0]]
+    
+    def keep_segment(self, segment):
+        # Timings and text only, for exporting again from Save As
+        kept = {key: segment[key] for key in ("start", "end", "text", "words") if key in segment}
+        self.last_segments.append(kept)
+    
+    def show_segment(self, text, progress):
+        self.output_text.insert(tk.END, text)
+        self.output_text.see(tk.END)
+        if progress is not None:
+            if str(self.progress.cget("mode")) != "determinate":
+                self.progress.stop()
+                self.progress.config(mode="determinate", maximum=100)
+            self.progress.config(value=progress * 100)
+    
+    def reset_progress(self):
+        self.progress.stop()
+        self.progress.config(mode="indeterminate", value=0)
     
     def start_transcription(self):
-        if self.is_transcribing:
-            return
-        
         # Validate input
         if self.input_method.get() == "youtube":
             url = self.url_entry.get().strip()
@@ -350,6 +528,7 @@ class TranscriberGUI:
             if not ("youtube.com" in url or "youtu.be" in url or "youtube" in url):
                 messagebox.showerror("Error", "Please enter a valid YouTube URL")
                 return
+            kind, source = "youtube", url
         else:
             file_path = self.file_path.get().strip()
             if not file_path:
@@ -361,71 +540,156 @@ class TranscriberGUI:
             if not os.path.isfile(file_path):
                 messagebox.showerror("Error", f"Selected path is not a file: {file_path}")
                 return
-        
-        # Start transcription
+            kind, source = "file", os.path.normpath(file_path)
+        
+        # Queue the job with the current settings; the scheduler picks it up
+        settings = {
+            "model": self.get_model_code(),
+            "language": self.get_language_code(),
+            "translate": self.translate_var.get(),
+            "timestamps": self.timestamps_var.get(),
+            "stream": self.stream_var.get(),
+            "vad": self.vad_var.get(),
+            "formats": ["txt"] + [fmt for fmt, var in self.format_vars.items() if var.get()],
+        }
+        priority = PRIORITIES.get(self.priority_var.get(), 0)
+        job_id = self.job_queue.enqueue(kind, source, settings, priority)
+        self.scheduler.wake()
+        if self.is_transcribing:
+            self.update_status(f"Job #{job_id} queued")
+        self.refresh_jobs()
+    
+    def job_started(self, job):
+        # updated is when the job was (re)queued
+        metrics.observe("queue_wait_seconds", time.time() - job["updated"])
         self.is_transcribing = True
         self.start_time = time.time()
-        self.transcribe_button.config(state="disabled")
         self.progress.start(8)
         self.output_text.delete(1.0, tk.END)
         self.save_button.config(state="disabled")
         self.copy_button.config(state="disabled")
+        self.update_status(f"Starting job #{job['id']}...")
         self.update_timer()
-        
-        thread = threading.Thread(target=self.transcription_worker, daemon=True)
-        thread.start()
+        self.refresh_jobs()
     
-    def transcription_worker(self):
-        try:
-            # Create output directory
-            output_dir = "output"
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-            
-            audio_file = None
-            title = "transcription"
-            temp_file = False
-            
-            if self.input_method.get() == "youtube":
-                url = self.url_entry.get().strip()
+    def refresh_jobs(self):
+        self.jobs_tree.delete(*self.jobs_tree.get_children())
+        for job in self.job_queue.list_jobs(limit=50):
+            source = job["source"] if job["kind"] == "youtube" else os.path.basename(job["source"])
+            self.jobs_tree.insert("", tk.END, values=(
+                job["id"], job["state"], job["settings"]["model"], job["attempts"], source))
+    
+    def transcription_worker(self, job):
+        """Run one queued job; returns the transcript path"""
+        settings = job["settings"]
+        
+        # Create output directory
+        output_dir = "output"
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        
+        audio_file = None
+        title = "transcription"
+        self.vad_summary = None
+        self.journal_summary = None
+        self.last_segments = []
+        formats = settings.get("formats", ["txt"])
+        
+        # Get transcription settings
+        model_size = settings["model"]
+        language = settings["language"]
+        get_model = lambda: self.get_model(model_size)
+        stats = {}
+        
+        url = None
+        if job["kind"] == "youtube":
+            url = job["source"]
+            cached = self.download_cache.lookup(url)
+            if cached:
+                audio_file, title = cached
+        
+        if url and not audio_file and settings["stream"]:
+            # Decode and transcribe while the download is still running
+            self.update_status("Streaming audio from YouTube...")
+            info = {}
+            job_journal = journal.Journal(
+                journal.job_journal_path(job["id"]),
+                journal.url_header(url, model_size, language, settings["translate"],
+                                   settings["vad"], transcriber.STREAM_WINDOW_SECONDS))
+            segments = downloads.stream_transcribe_url(get_model, url, language,
+                                                       translate=settings["translate"],
+                                                       vad=settings["vad"], stats=stats, info=info,
+                                                       download_cache=self.download_cache,
+                                                       journal=job_journal,
+                                                       status_callback=self.update_status)
+            output_file = self.journaled_transcription(
+                job_journal, segments, lambda: info.get("title") or title, output_dir,
+                settings["timestamps"], formats)
+        else:
+            if url and not audio_file:
                 audio_file, title = self.download_audio(url)
-                temp_file = True
-            else:
-                audio_file = os.path.normpath(self.file_path.get().strip())
+            elif not url:
+                audio_file = job["source"]
                 title = Path(audio_file).stem
             
-            # Get transcription settings
-            model_size = self.get_model_code()
-            language = self.get_language_code()
-            
-            # Transcribe
-            transcript = self.transcribe_audio(audio_file, model_size, language)
-            
-            if not transcript.strip():
-                raise Exception("Transcription returned empty result")
-            
-            # Save transcript
-            safe_title = "".join(c if c.isalnum() or c in " _-.()" else "_" for c in title)[:100]
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"{safe_title}_{timestamp}_transcript.txt"
-            self.output_file = os.path.join(output_dir, filename)
-            
-            with open(self.output_file, "w", encoding="utf-8") as f:
-                f.write(transcript)
-            
-            # Update UI in main thread
-            self.root.after(0, lambda: self.transcription_complete(transcript, temp_file, audio_file))
-            
+            # Long recordings are decoded window by window even without live
+            # output, so they can be checkpointed
+            if settings["stream"] or ((transcriber.probe_duration(audio_file) or 0)
+                                      >= journal.MIN_SECONDS):
+                # Segments are written and displayed as they finish, and journaled
+                # so an interrupted job resumes after its last checkpoint
+                job_journal = journal.Journal(
+                    journal.job_journal_path(job["id"]),
+                    journal.source_header(audio_file, model_size, language, settings["translate"],
+                                          settings["vad"], transcriber.STREAM_WINDOW_SECONDS))
+                self.update_status("Checking transcript cache...")
+                segments = transcriber.stream_transcribe(get_model, audio_file, model_size, language,
+                                                         translate=settings["translate"],
+                                                         cache=self.transcript_cache,
+                                                         status_callback=self.update_status,
+                                                         vad=settings["vad"], stats=stats,
+                                                         store=self.audio_store,
+                                                         detector=self.language_detector,
+                                                         journal=job_journal)
+                output_file = self.journaled_transcription(job_journal, segments, lambda: title,
+                                                           output_dir, settings["timestamps"],
+                                                           formats)
+            else:
+                # Transcribe
+                result = self.transcribe_audio(audio_file, model_size, language, settings)
+                
+                # Save transcript in every chosen format
+                paths = export.save_result(result, title, output_dir, formats,
+                                           settings["timestamps"])
+                output_file = paths[formats[0]]
+                for segment in result.get("segments", []):
+                    self.keep_segment(segment)
+                transcript = transcriber.format_result(result, settings["timestamps"])
+                self.root.after(0, lambda: self.show_transcript(transcript))
+        
+        if stats:
+            metrics.count("audio_seconds", stats["audio_seconds"])
+        if settings["vad"] and stats:
+            self.vad_summary = vad.format_speedup(stats["audio_seconds"], stats["speech_seconds"])
+        
+        try:
+            self.search_index.add(output_file, self.last_segments)
         except Exception as e:
-            error_msg = str(e)
-            self.root.after(0, lambda: self.transcription_error(error_msg))
+            # The transcript is saved; a stale index shouldn't fail the job
+            self.update_status(f"Could not update search index: {e}")
+        return output_file
     
-    def transcription_complete(self, transcript, temp_file, audio_file):
-        self.progress.stop()
+    def show_transcript(self, transcript):
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(1.0, transcript)
+    
+    def transcription_complete(self, job, output_file):
+        self.output_file = output_file
+        self.reset_progress()
         self.is_transcribing = False
-        self.transcribe_button.config(state="normal")
         self.save_button.config(state="normal")
         self.copy_button.config(state="normal")
+        self.refresh_jobs()
         
         # Show final time
         if self.start_time:
@@ -434,37 +698,45 @@ class TranscriberGUI:
             seconds = int(total_time % 60)
             self.timer_label.config(text=f"Completed in {minutes:02d}:{seconds:02d}")
         
-        # Display transcript
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.insert(1.0, transcript)
-        
-        self.update_status(f"✅ Transcription complete! Saved to output folder")
+        transcript = self.output_text.get(1.0, tk.END)
         
-        # Clean up temporary file
-        if temp_file and audio_file and os.path.exists(audio_file):
-            try:
-                os.remove(audio_file)
-            except:
-                pass
-        
-        # Show success message
-        word_count = len(transcript.split())
-        messagebox.showinfo("Success", 
-                           f"Transcription completed!\n\n"
-                           f"Words: {word_count:,}\n"
-                           f"Saved to: {os.path.basename(self.output_file)}")
-    
-    def transcription_error(self, error_msg):
-        self.progress.stop()
+        summaries = [s for s in (self.vad_summary, self.journal_summary) if s]
+        if summaries:
+            self.update_status(f"✅ Transcription complete! Saved to output folder "
+                               f"({'; '.join(summaries)})")
+        else:
+            self.update_status(f"✅ Transcription complete! Saved to output folder")
+        
+        # Show success message once the queue is drained
+        if self.job_queue.pending_count() == 0:
+            word_count = len(transcript.split())
+            messagebox.showinfo("Success", 
+                               f"Transcription completed!\n\n"
+                               f"Words: {word_count:,}\n"
+                               f"Saved to: {os.path.basename(self.output_file)}")
+    
+    def transcription_error(self, job, error_msg, retry=False):
+        self.reset_progress()
         self.is_transcribing = False
-        self.transcribe_button.config(state="normal")
+        self.refresh_jobs()
+        
+        if retry:
+            self.update_status(f"❌ Job #{job['id']} failed, will retry "
+                               f"(attempt {job['attempts']} of {job['max_attempts']})")
+            return
+        
+        # Out of attempts, so nothing will resume from its journal
+        journal.discard(job["id"])
+        
         self.update_status("❌ Transcription failed")
         
         # Show error with helpful suggestions
         if "yt-dlp" in error_msg:
             error_msg += "\n\nTip: Make sure yt-dlp is installed: pip install yt-dlp"
-        elif "model" in error_msg.lower():
-            error_msg += "\n\nTip: Try a smaller model size if you're running out of memory"
+        elif "model" in error_msg.lower() or "memory" in error_msg.lower():
+            error_msg += ("\n\nTip: If you're running out of memory, set Backend to bf16 or mmap, "
+                          "which map the model file instead of reading it and need about half "
+                          "the memory while loading, or int8, or try a smaller model size")
         
         messagebox.showerror("Transcription Error", error_msg)
     
@@ -478,6 +750,8 @@ class TranscriberGUI:
             filetypes=[
                 ("Text files", "*.txt"), 
                 ("SRT subtitles", "*.srt"),
+                ("WebVTT subtitles", "*.vtt"),
+                ("JSON with timings", "*.json"),
                 ("All files", "*.*")
             ],
             initialname=os.path.basename(self.output_file)
@@ -485,13 +759,74 @@ class TranscriberGUI:
         
         if file_path:
             try:
-                content = self.output_text.get(1.0, tk.END).strip()
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                fmt = os.path.splitext(file_path)[1].lower().lstrip(".")
+                if fmt in export.FORMATS[1:]:
+                    # Subtitles and JSON are built from the segment timings
+                    segments = self.last_segments or self.saved_segments()
+                    if not segments:
+                        messagebox.showerror("Error", "This transcript has no segment timings; "
+                                                      "save it as a .txt file instead")
+                        return
+                    with export.Exporter({fmt: file_path}) as exporter:
+                        for segment in segments:
+                            exporter.write(segment)
+                else:
+                    content = self.output_text.get(1.0, tk.END).strip()
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(content)
                 messagebox.showinfo("Success", f"Transcript saved to:\n{file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save file:\n{e}")
     
+    def saved_segments(self):
+        # Timed segments of a transcript opened from disk (e.g. a search
+        # hit), from its JSON export or timestamped lines; [] without timings
+        segments = [{"start": start, "end": end, "text": text}
+                    for start, end, text in search.read_segments(self.output_file)]
+        if not segments or any(segment["start"] is None for segment in segments):
+            return []
+        return segments
+    
+    def run_search(self):
+        query = self.search_entry.get().strip()
+        self.search_tree.delete(*self.search_tree.get_children())
+        self.search_hits = {}
+        if not query:
+            return
+        start = time.perf_counter()
+        hits = self.search_index.search(query, limit=100)
+        elapsed = time.perf_counter() - start
+        for hit in hits:
+            item = self.search_tree.insert("", tk.END, values=(
+                search.format_time(hit["start"]), hit["title"], hit["snippet"]))
+            self.search_hits[item] = hit
+        self.update_status(f"{len(hits)} match(es) in {elapsed * 1000:.0f} ms")
+    
+    def open_search_hit(self, event=None):
+        selection = self.search_tree.selection()
+        if not selection or selection[0] not in self.search_hits:
+            return
+        hit = self.search_hits[selection[0]]
+        try:
+            with open(hit["path"], encoding="utf-8") as f:
+                content = f.read()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to open transcript:\n{e}")
+            return
+        self.show_transcript(content)
+        self.output_file = hit["path"]
+        self.last_segments = []
+        # Scroll to the matching text
+        needle = hit["snippet"].replace("[", "").replace("]", "").strip(".").strip()[:40]
+        position = self.output_text.search(needle, "1.0", tk.END) if needle else ""
+        if position:
+            self.output_text.see(position)
+            self.output_text.tag_remove(tk.SEL, "1.0", tk.END)
+            self.output_text.tag_add(tk.SEL, position, f"{position}+{len(needle)}c")
+        self.save_button.config(state="normal")
+        self.copy_button.config(state="normal")
+        self.update_status(f"{os.path.basename(hit['path'])} at {search.format_time(hit['start'])}")
+    
     def copy_transcript(self):
         try:
             content = self.output_text.get(1.0, tk.END).strip()
@@ -501,14 +836,48 @@ class TranscriberGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to copy text:\n{e}")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-Language Audio Transcriber")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    batch_parser = subparsers.add_parser("batch", help="transcribe many files without the GUI")
+    batch.add_arguments(batch_parser)
+    
+    serve_parser = subparsers.add_parser("serve", help="run a local HTTP transcription service")
+    server.add_arguments(serve_parser)
+    
+    search_parser = subparsers.add_parser("search", help="search saved transcripts")
+    search.add_arguments(search_parser)
+    
+    bench_parser = subparsers.add_parser("bench", help="benchmark models offline on synthetic audio")
+    bench.add_arguments(bench_parser)
+    
+    return parser.parse_args(argv)
+
 def main():
-    # Check dependencies
-    try:
-        import whisper
-    except ImportError:
+    args = parse_args()
+    
+    # Searching saved transcripts never touches whisper
+    if args.command == "search":
+        search.main(args)
+        return
+    
+    # Check dependencies without importing them; the GUI imports whisper in
+    # the background and the commands on first use
+    if importlib.util.find_spec("whisper") is None:
         print("Error: whisper not installed. Run: pip install openai-whisper")
         sys.exit(1)
     
+    if args.command == "batch":
+        batch.main(args)
+        return
+    if args.command == "serve":
+        server.main(args)
+        return
+    if args.command == "bench":
+        bench.main(args)
+        return
+    
     # Create and setup the GUI
     root = tk.Tk()
     
@@ -534,6 +903,8 @@ def main():
     # Set minimum size
     root.minsize(600, 500)
     
+    root.update()
+    app.startup_times["first_paint"] = time.time()
     root.mainloop()
 
 if __name__ == "__main__":
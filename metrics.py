@@ -0,0 +1,222 @@
+"""Per-stage timing spans and counters, logged as JSON lines and exported for Prometheus
+
+Disabled unless configure() is called or TRANSCRIBER_METRICS_LOG is set;
+while disabled span() hands back a shared no-op context manager and the
+other calls return at once.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+# Set to a file path to enable metrics in this process and its children
+LOG_ENV = "TRANSCRIBER_METRICS_LOG"
+PREFIX = "transcriber"
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    def __init__(self, metrics, stage, fields):
+        self.metrics = metrics
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        record = {"ts": self.wall_start, "stage": self.stage, "seconds": seconds,
+                  "pid": os.getpid()}
+        record.update(self.fields)
+        if exc is not None:
+            record["error"] = str(exc)
+        self.metrics.observe("stage_seconds", seconds, stage=self.stage)
+        self.metrics.write(record)
+        return False
+
+
+class Metrics:
+    """Collects stage spans, counters and summaries.
+
+    Summaries keep a count and a sum per label set, which is what the
+    Prometheus summary type needs without quantiles. Stats of caches and
+    other components are pulled from their stats() methods at export time.
+    Worker processes hand what they collected to the parent with drain(),
+    which adds it in with merge().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.log_path = None
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._summaries = {}  # (name, labels) -> [count, sum]
+        self._sources = {}  # name -> callable returning a stats dict
+        self._remote = {}  # worker pid -> its latest component stats
+
+    def configure(self, log_path=None):
+        """Enable collection, appending spans to log_path if given.
+
+        The path is also put in the environment so worker processes started
+        afterwards log to the same file.
+        """
+        self.enabled = True
+        self.log_path = log_path
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            os.environ[LOG_ENV] = log_path
+
+    def span(self, stage, **fields):
+        """Context manager timing one stage; extra fields go into the log line"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, fields)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+
+    def register(self, name, stats):
+        """Export the numbers in stats() (e.g. cache hits and hit_rate) under name"""
+        with self._lock:
+            self._sources[name] = stats
+
+    def write(self, record):
+        if not self.log_path:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        # One append per line keeps lines from several processes intact
+        with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def snapshot(self):
+        """Current counters, summaries and component stats as plain dicts.
+
+        Stats merged from workers are added to the component of the same
+        name here, with hit_rate worked out again from the summed hits and
+        misses.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {key: list(value) for key, value in self._summaries.items()}
+            sources = dict(self._sources)
+            remote = list(self._remote.values())
+        components = {name: stats() for name, stats in sources.items()}
+        for worker_components in remote:
+            for name, stats in worker_components.items():
+                components[name] = _combine_stats(components.get(name), stats)
+        return _export(counters, summaries, components)
+
+    def drain(self):
+        """Snapshot to send from a worker process to its parent: the counters
+        and summaries collected since the last drain, which are cleared here,
+        and the current component stats"""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            summaries, self._summaries = self._summaries, {}
+            sources = dict(self._sources)
+        snapshot = _export(counters, summaries,
+                           {name: stats() for name, stats in sources.items()})
+        snapshot["pid"] = os.getpid()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a worker's drain() to this process's numbers (None is ignored)"""
+        if not snapshot:
+            return
+        with self._lock:
+            for counter in snapshot["counters"]:
+                key = (counter["name"], tuple(sorted(counter["labels"].items())))
+                self._counters[key] = self._counters.get(key, 0) + counter["value"]
+            for summary in snapshot["summaries"]:
+                key = (summary["name"], tuple(sorted(summary["labels"].items())))
+                total = self._summaries.setdefault(key, [0, 0.0])
+                total[0] += summary["count"]
+                total[1] += summary["sum"]
+            # Component stats are running totals per worker, so keep the latest
+            self._remote[snapshot["pid"]] = snapshot["components"]
+
+    def prometheus(self):
+        """Everything in snapshot() in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def emit(name, kind, labels, value):
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {float(value)}")
+
+        for counter in snapshot["counters"]:
+            emit(f"{PREFIX}_{counter['name']}_total", "counter", counter["labels"],
+                 counter["value"])
+        for summary in snapshot["summaries"]:
+            name = f"{PREFIX}_{summary['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            labels = _format_labels(summary["labels"])
+            lines.append(f"{name}_count{labels} {float(summary['count'])}")
+            lines.append(f"{name}_sum{labels} {float(summary['sum'])}")
+        for component, stats in snapshot["components"].items():
+            for key, value in sorted(stats.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    emit(f"{PREFIX}_{component}_{key}", "gauge", {}, value)
+        return "\n".join(lines) + "\n"
+
+
+def _export(counters, summaries, components):
+    return {
+        "counters": [{"name": name, "labels": dict(labels), "value": value}
+                     for (name, labels), value in sorted(counters.items())],
+        "summaries": [{"name": name, "labels": dict(labels), "count": count, "sum": total}
+                      for (name, labels), (count, total) in sorted(summaries.items())],
+        "components": dict(sorted(components.items())),
+    }
+
+
+def _combine_stats(ours, theirs):
+    # Numbers are summed; other values (e.g. lists of loaded models) keep ours
+    combined = dict(ours or {})
+    for key, value in theirs.items():
+        if key not in combined:
+            combined[key] = value
+        elif (isinstance(value, (int, float)) and not isinstance(value, bool)
+              and isinstance(combined[key], (int, float))):
+            combined[key] += value
+    if "hits" in combined and "misses" in combined:
+        lookups = combined["hits"] + combined["misses"]
+        combined["hit_rate"] = combined["hits"] / lookups if lookups else 0.0
+    return combined
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+# Process-wide instance used by the rest of the app
+metrics = Metrics()
+if os.environ.get(LOG_ENV):
+    metrics.configure(os.environ[LOG_ENV])
@@ -0,0 +1,148 @@
+"""Registry of loaded Whisper models kept under a memory budget"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import lowmem
+import transcriber
+
+# Default RAM budget for loaded models, override with TRANSCRIBER_MODEL_BUDGET_MB
+DEFAULT_BUDGET_MB = int(os.environ.get("TRANSCRIBER_MODEL_BUDGET_MB", "4096"))
+
+
+def model_size_bytes(model):
+    """Approximate memory held by a model's weights and buffers.
+
+    Goes through the state dict so the packed int8 weights of quantized
+    layers, which aren't parameters, are counted too.
+    """
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, tuple) else (value,)
+        for tensor in tensors:
+            if hasattr(tensor, "element_size"):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Keeps several loaded models and evicts the least recently used one
+    once their combined size exceeds the budget.
+
+    Safe to use from several threads; concurrent requests for a model that is
+    still loading wait for the same load instead of starting another one.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, loader=transcriber.load_model):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._loader = loader
+        self._models = OrderedDict()  # name -> (model, size in bytes)
+        self._loading = {}  # name -> Future of an in-flight load
+        self._lock = threading.Lock()
+        self.memory = {}  # name -> process memory right after it loaded
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, model_size):
+        """Return the loaded model, loading it (and evicting others) if needed"""
+        with self._lock:
+            if model_size in self._models:
+                self._models.move_to_end(model_size)
+                self.hits += 1
+                return self._models[model_size][0]
+            self.misses += 1
+            future = self._loading.get(model_size)
+            owner = future is None
+            if owner:
+                future = self._loading[model_size] = Future()
+
+        if owner:
+            self._load(model_size, future)
+        return future.result()
+
+    def preload(self, model_size):
+        """Start loading a model in the background if it isn't loaded yet"""
+        with self._lock:
+            if model_size in self._models or model_size in self._loading:
+                return
+            future = self._loading[model_size] = Future()
+
+        thread = threading.Thread(target=self._load, args=(model_size, future), daemon=True)
+        thread.start()
+
+    def is_loaded(self, model_size):
+        with self._lock:
+            return model_size in self._models
+
+    def loaded_models(self):
+        with self._lock:
+            return list(self._models)
+
+    def _load(self, model_size, future):
+        start = time.time()
+        try:
+            model = self._loader(model_size)
+            size = model_size_bytes(model)
+            memory = lowmem.memory_usage()
+        except Exception as e:
+            # Everyone waiting on the future gets the error instead of hanging
+            with self._lock:
+                self._loading.pop(model_size, None)
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self.memory[model_size] = memory
+            self.loads += 1
+            self.load_seconds += time.time() - start
+            self._models[model_size] = (model, size)
+            self._loading.pop(model_size, None)
+            self._evict()
+        future.set_result(model)
+
+    def _evict(self):
+        # The most recently loaded model sits at the end and is never evicted
+        while len(self._models) > 1 and self._used_bytes() > self.budget_bytes:
+            self._models.popitem(last=False)
+            self.evictions += 1
+
+    def _used_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            memory = lowmem.memory_usage()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+                "loaded": list(self._models),
+                "used_mb": self._used_bytes() / (1024 * 1024),
+                "budget_mb": self.budget_bytes / (1024 * 1024),
+                "rss_mb": memory["rss_mb"],
+                "peak_rss_mb": memory["peak_rss_mb"],
+            }
+
+    def format_stats(self, model_size=None):
+        """One-line summary; with model_size, also the process memory
+        measured right after that model loaded"""
+        s = self.stats()
+        text = (f"models: {', '.join(s['loaded']) or 'none'} "
+                f"({s['used_mb']:.0f}/{s['budget_mb']:.0f} MB), "
+                f"hits {s['hits']}, misses {s['misses']}, "
+                f"load time {s['load_seconds']:.1f}s")
+        with self._lock:
+            memory = self.memory.get(model_size)
+        if memory:
+            text += f", after load {lowmem.format_memory(memory)}"
+        return text
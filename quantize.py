@@ -0,0 +1,60 @@
+"""Int8 dynamic quantization of Whisper's linear layers for CPU inference"""
+import os
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "models")
+
+
+def quantize_model(model):
+    """Copy of model with every linear layer dynamically quantized to int8.
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    speeds up the matmuls that dominate CPU inference and shrinks the model
+    to roughly a third. Embeddings, layer norms and convolutions stay fp32.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    model = model.float().cpu().eval()
+    for module in model.modules():
+        # whisper's Linear subclass only adds a dtype cast in forward; the
+        # quantizer only converts exact nn.Linear instances
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def cache_path(model_size, cache_dir=DEFAULT_CACHE_DIR):
+    import torch
+    import whisper
+    return os.path.join(cache_dir, f"{model_size}-int8-whisper{whisper.__version__}"
+                                   f"-torch{torch.__version__}.pt")
+
+
+def load_int8(model_size, cache_dir=DEFAULT_CACHE_DIR):
+    """Quantized model, converted once and then read from cache_dir"""
+    import torch
+    import whisper
+
+    path = cache_path(model_size, cache_dir)
+    if os.path.exists(path):
+        try:
+            # Our own file holding the whole pickled module
+            return torch.load(path, map_location="cpu", weights_only=False)
+        except Exception:
+            os.remove(path)
+
+    model = quantize_model(whisper.load_model(model_size, device="cpu"))
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        # Only the cache is lost; the converted model is still usable
+        pass
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return model
@@ -0,0 +1,239 @@
+"""Full-text search over saved transcripts, kept in a SQLite FTS5 index"""
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = os.path.join("output", "search.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    title TEXT,
+    mtime REAL NOT NULL,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segment_rows (
+    id INTEGER PRIMARY KEY,
+    transcript_id INTEGER NOT NULL,
+    start_time REAL,
+    end_time REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segment_rows_transcript ON segment_rows (transcript_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5 (
+    text,
+    content = 'segment_rows',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segment_rows_insert AFTER INSERT ON segment_rows BEGIN
+    INSERT INTO segments (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segment_rows_delete AFTER DELETE ON segment_rows BEGIN
+    INSERT INTO segments (segments, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# "[MM:SS - MM:SS] text" lines written with timestamps turned on
+TIMESTAMP_LINE = re.compile(r"^\[(\d+):(\d{2}) - (\d+):(\d{2})\] ?(.*)$")
+
+
+def read_segments(path):
+    """(start, end, text) segments of a saved transcript.
+
+    Uses the JSON export saved next to it when there is one, then timestamped
+    lines, and otherwise indexes each paragraph without a time.
+    """
+    json_path = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(json_path):
+        try:
+            with open(json_path, encoding="utf-8") as f:
+                return [(s["start"], s["end"], s["text"]) for s in json.load(f)["segments"]]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    segments = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            match = TIMESTAMP_LINE.match(line)
+            if match:
+                m1, s1, m2, s2, text = match.groups()
+                segments.append((int(m1) * 60 + int(s1), int(m2) * 60 + int(s2), text))
+            else:
+                segments.append((None, None, line))
+    return segments
+
+
+def to_fts_query(query):
+    """Quote every word so user input can't trip FTS5 query syntax; a
+    trailing * on a word keeps prefix matching"""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """Segment-level full-text index of transcripts.
+
+    Segments live in a plain table that an external-content FTS5 table
+    indexes through triggers, so replacing one transcript touches only its
+    own rows. Each transcript is indexed once and only re-indexed when its
+    file changes, so keeping the index current costs one stat per file.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            self._conn.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            raise Exception(f"SQLite FTS5 is not available: {str(e)}")
+
+    def add(self, path, segments, title=None):
+        """Index (start, end, text) segments, or segment dicts, for path,
+        replacing whatever was indexed for it before"""
+        path = os.path.abspath(path)
+        rows = []
+        for segment in segments:
+            if isinstance(segment, dict):
+                segment = (segment.get("start"), segment.get("end"), segment.get("text", ""))
+            start, end, text = segment
+            if text.strip():
+                rows.append((text.strip(), start, end))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._remove(path)
+                cursor = self._conn.execute(
+                    "INSERT INTO transcripts (path, title, mtime, indexed) VALUES (?, ?, ?, ?)",
+                    (path, title or _title_from_path(path), os.path.getmtime(path), time.time()))
+                transcript_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO segment_rows (transcript_id, start_time, end_time, text) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(transcript_id, start, end, text) for text, start, end in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add_file(self, path, title=None):
+        self.add(path, read_segments(path), title)
+
+    def _remove(self, path):
+        row = self._conn.execute("SELECT id FROM transcripts WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM segment_rows WHERE transcript_id = ?", (row["id"],))
+            self._conn.execute("DELETE FROM transcripts WHERE id = ?", (row["id"],))
+
+    def sync(self, output_dir="output"):
+        """Index new or changed *_transcript.txt files under output_dir and
+        drop entries whose file is gone. Returns (added, removed)."""
+        with self._lock:
+            known = {row["path"]: row["mtime"] for row in
+                     self._conn.execute("SELECT path, mtime FROM transcripts")}
+
+        added = 0
+        seen = set()
+        for root, _, names in os.walk(output_dir):
+            for name in names:
+                if not name.endswith("_transcript.txt"):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                seen.add(path)
+                try:
+                    if known.get(path) == os.path.getmtime(path):
+                        continue
+                    self.add_file(path)
+                    added += 1
+                except (OSError, UnicodeDecodeError):
+                    continue
+
+        root = os.path.abspath(output_dir)
+        removed = 0
+        with self._lock:
+            for path in known:
+                if path not in seen and path.startswith(root + os.sep) and not os.path.exists(path):
+                    self._remove(path)
+                    removed += 1
+        return added, removed
+
+    def search(self, query, limit=20):
+        """Best matching segments first, as dicts with path, title, start,
+        end and a snippet with the matches in [brackets]"""
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.path, t.title, r.start_time AS start, r.end_time AS end, "
+                "snippet(segments, 0, '[', ']', '...', 16) AS snippet "
+                "FROM segments JOIN segment_rows r ON r.id = segments.rowid "
+                "JOIN transcripts t ON t.id = r.transcript_id "
+                "WHERE segments MATCH ? ORDER BY bm25(segments) LIMIT ?",
+                (fts_query, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            transcripts = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+            segments = self._conn.execute("SELECT COUNT(*) FROM segment_rows").fetchone()[0]
+        return {"transcripts": transcripts, "segments": segments}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _title_from_path(path):
+    name = os.path.basename(path)
+    # Strip the "_YYYYMMDD_HHMMSS_transcript.txt" suffix added on save
+    match = re.match(r"^(.*)_\d{8}_\d{6}_transcript\.\w+$", name)
+    return match.group(1) if match else os.path.splitext(name)[0]
+
+
+def format_time(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def add_arguments(parser):
+    parser.add_argument("query", help="words to look for; end a word with * to match prefixes")
+    parser.add_argument("--output", default="output", help="transcript directory")
+    parser.add_argument("--limit", type=int, default=20, help="maximum number of hits")
+
+
+def main(args):
+    index = SearchIndex(os.path.join(args.output, "search.db"))
+    start = time.perf_counter()
+    added, removed = index.sync(args.output)
+    if added or removed:
+        print(f"Index updated: {added} added, {removed} removed")
+    search_start = time.perf_counter()
+    hits = index.search(args.query, args.limit)
+    elapsed = time.perf_counter() - search_start
+    for hit in hits:
+        print(f"{hit['path']} @ {format_time(hit['start'])}: {hit['snippet']}")
+    print(f"{len(hits)} hit(s) in {elapsed * 1000:.1f} ms "
+          f"(sync {(search_start - start) * 1000:.1f} ms)")
+    index.close()
@@ -0,0 +1,414 @@
+"""Local HTTP transcription service that keeps models warm between requests"""
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import threading
+import tempfile
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import transcriber
+import downloads
+from models import ModelRegistry
+from cache import TranscriptCache
+from audio_store import AudioStore
+from langid import LanguageDetector
+from metrics import metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MODEL_SIZES = ("tiny", "base", "small", "medium", "large")
+
+DEFAULT_UPLOAD_DIR = os.path.join("cache", "uploads")
+# Largest accepted upload, override with TRANSCRIBER_MAX_UPLOAD_MB
+MAX_UPLOAD_MB = int(os.environ.get("TRANSCRIBER_MAX_UPLOAD_MB", "2048"))
+# Finished requests kept around for polling
+MAX_FINISHED = 1000
+# Latency percentiles are taken over this many recent requests
+LATENCY_WINDOW = 1000
+
+
+def discard_upload(path):
+    """Delete an uploaded file that is no longer needed"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values (0 for no values)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class TranscriptionService:
+    """Queues transcription requests onto one worker thread per model.
+
+    Every model is loaded once through a shared ModelRegistry and used by a
+    single worker, so concurrent requests for the same model wait their turn
+    on the warm copy instead of loading their own. (Whisper installs hooks on
+    the model while decoding, so one copy can't serve two requests at once.)
+    """
+
+    def __init__(self, models=None, cache=None, store=None, download_cache=None,
+                 upload_dir=DEFAULT_UPLOAD_DIR, detector=None):
+        self.models = models or ModelRegistry()
+        self.cache = cache
+        self.store = store
+        self.detector = detector
+        self.download_cache = download_cache or downloads.DownloadCache()
+        self.upload_dir = upload_dir
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._download_lock = threading.Lock()
+        self._requests = {}
+        self._finished = deque()
+        self._queues = {}  # model size -> queue.Queue of request ids
+        self._workers = {}
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._waits = deque(maxlen=LATENCY_WINDOW)
+        self.completed = 0
+        self.failed = 0
+
+        metrics.register("models", self.models.stats)
+        metrics.register("download_cache", self.download_cache.stats)
+        if cache is not None:
+            metrics.register("transcript_cache", cache.stats)
+        if store is not None:
+            metrics.register("audio_store", store.stats)
+        if detector is not None and detector.cache is not None:
+            metrics.register("language_cache", detector.cache.stats)
+
+    def submit(self, model_size="base", file_path=None, url=None, language=None,
+               translate=False, vad=False, upload=False):
+        """Queue a file or YouTube URL; returns the request id.
+
+        With upload=True file_path came from save_upload and is deleted once
+        the request finishes.
+        """
+        if transcriber.parse_model_name(model_size)[0] not in MODEL_SIZES:
+            raise ValueError(f"Unknown model: {model_size}")
+        if not file_path and not url:
+            raise ValueError("A file or url is required")
+        if file_path and not os.path.isfile(file_path):
+            raise ValueError(f"File not found: {file_path}")
+        if url and not downloads.extract_video_id(url):
+            raise ValueError(f"Not a YouTube URL: {url}")
+
+        request = {
+            "id": hashlib.sha1(os.urandom(16)).hexdigest()[:16],
+            "state": "queued",
+            "model": model_size,
+            "file": file_path,
+            "url": url,
+            "language": language,
+            "translate": translate,
+            "vad": vad,
+            "upload": upload,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+            "result": None,
+        }
+        with self._lock:
+            self._requests[request["id"]] = request
+            if model_size not in self._queues:
+                self._queues[model_size] = queue.Queue()
+                worker = threading.Thread(target=self._work, args=(model_size,), daemon=True)
+                self._workers[model_size] = worker
+                worker.start()
+            self._queues[model_size].put(request["id"])
+        return request["id"]
+
+    def save_upload(self, stream, length, extension=""):
+        """Write an uploaded body to a new file in the upload directory and
+        return the path. Submit it with upload=True so it is deleted when its
+        request finishes; repeated uploads still hit the transcript cache,
+        which is keyed by content."""
+        if length > MAX_UPLOAD_MB * 1024 * 1024:
+            raise ValueError(f"Upload larger than {MAX_UPLOAD_MB} MB")
+        fd, path = tempfile.mkstemp(dir=self.upload_dir, suffix=extension)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    block = stream.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        raise ValueError("Upload ended early")
+                    f.write(block)
+                    remaining -= len(block)
+        except BaseException:
+            discard_upload(path)
+            raise
+        return path
+
+    def _work(self, model_size):
+        jobs = self._queues[model_size]
+        while True:
+            request_id = jobs.get()
+            request = self._requests[request_id]
+            request["state"] = "running"
+            request["started"] = time.time()
+            try:
+                request["result"] = self._transcribe(request)
+                request["state"] = "done"
+            except Exception as e:
+                request["error"] = str(e)
+                request["state"] = "failed"
+            if request["upload"]:
+                discard_upload(request["file"])
+            request["finished"] = time.time()
+            self._finish(request)
+
+    def _transcribe(self, request):
+        file_path = request["file"]
+        if request["url"]:
+            with self._download_lock:
+                file_path, request["title"] = self.download_cache.fetch(request["url"])
+        model_size = request["model"]
+        return transcriber.transcribe_cached(lambda: self.models.get(model_size), file_path,
+                                             model_size, request["language"],
+                                             translate=request["translate"], cache=self.cache,
+                                             vad=request["vad"], store=self.store,
+                                             detector=self.detector)
+
+    def _finish(self, request):
+        metrics.count("requests", model=request["model"], state=request["state"])
+        metrics.observe("queue_wait_seconds", request["started"] - request["submitted"],
+                        model=request["model"])
+        if request["result"] is not None:
+            metrics.count("audio_seconds", request["result"].get("duration") or 0.0)
+        with self._lock:
+            if request["state"] == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._latencies.append(request["finished"] - request["submitted"])
+            self._waits.append(request["started"] - request["submitted"])
+            self._finished.append(request["id"])
+            while len(self._finished) > MAX_FINISHED:
+                self._requests.pop(self._finished.popleft(), None)
+
+    def status(self, request_id):
+        """Request state without its segments, or None if unknown"""
+        request = self._requests.get(request_id)
+        if request is None:
+            return None
+        status = {key: request[key] for key in
+                  ("id", "state", "model", "url", "language", "translate", "vad",
+                   "submitted", "started", "finished", "error")}
+        if request["state"] == "queued":
+            status["queue_position"] = self._queue_position(request)
+        result = request["result"]
+        if result is not None:
+            status["detected_language"] = result.get("language")
+            status["duration"] = result.get("duration")
+            status["text"] = result["text"].strip()
+        return status
+
+    def _queue_position(self, request):
+        with self._lock:
+            queued = [r for r in self._requests.values()
+                      if r["state"] == "queued" and r["model"] == request["model"]]
+        return sum(1 for r in queued if r["submitted"] < request["submitted"]) + 1
+
+    def result(self, request_id):
+        request = self._requests.get(request_id)
+        return request and request["result"]
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(1 for r in self._requests.values() if r["state"] == "queued")
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            waits = list(self._waits)
+            by_model = {}
+            for r in self._requests.values():
+                if r["state"] in ("queued", "running"):
+                    counts = by_model.setdefault(r["model"], {"queued": 0, "running": 0})
+                    counts[r["state"]] += 1
+            stats = {
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_depth": sum(c["queued"] for c in by_model.values()),
+                "running": sum(c["running"] for c in by_model.values()),
+                "by_model": by_model,
+            }
+        stats["latency_p50"] = percentile(latencies, 50)
+        stats["latency_p95"] = percentile(latencies, 95)
+        stats["wait_p50"] = percentile(waits, 50)
+        stats["wait_p95"] = percentile(waits, 95)
+        stats["models"] = self.models.stats()
+        if self.cache is not None:
+            stats["transcript_cache"] = self.cache.stats()
+        if self.store is not None:
+            stats["audio_store"] = self.store.stats()
+        if self.detector is not None and self.detector.cache is not None:
+            stats["language_cache"] = self.detector.cache.stats()
+        return stats
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"{s['completed']} done, {s['failed']} failed, queue depth {s['queue_depth']}, "
+                f"latency p50 {s['latency_p50']:.2f}s p95 {s['latency_p95']:.2f}s")
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """JSON API:
+
+    POST /transcribe          JSON {"url" or "path", "model", "backend", "language",
+                              "translate", "vad"}, or raw audio in the body
+                              with the options in the query string
+    GET  /requests/<id>       state, and the text once done
+    GET  /requests/<id>/segments
+    GET  /stats               latency percentiles, queue depth, cache stats
+    GET  /metrics             the same counters in Prometheus text format
+                              (only with --metrics or --metrics-log)
+    GET  /health
+    """
+
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts == ["health"]:
+            self._send_json(200, {"status": "ok"})
+        elif parts == ["stats"]:
+            self._send_json(200, self.service.stats())
+        elif parts == ["metrics"] and metrics.enabled:
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif len(parts) == 2 and parts[0] == "requests":
+            status = self.service.status(parts[1])
+            if status is None:
+                self._send_json(404, {"error": "Unknown request"})
+            else:
+                self._send_json(200, status)
+        elif len(parts) == 3 and parts[0] == "requests" and parts[2] == "segments":
+            status = self.service.status(parts[1])
+            if status is None:
+                self._send_json(404, {"error": "Unknown request"})
+            elif status["state"] != "done":
+                self._send_json(409, {"error": f"Request is {status['state']}", "state": status["state"]})
+            else:
+                result = self.service.result(parts[1])
+                self._send_json(200, {"id": parts[1], "language": result.get("language"),
+                                      "segments": result["segments"]})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        if parsed.path.rstrip("/") != "/transcribe":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("application/json"):
+                options = json.loads(self.rfile.read(length) or b"{}")
+                file_path = options.get("path")
+                uploaded = False
+            else:
+                options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                if not length:
+                    raise ValueError("Empty upload")
+                extension = os.path.splitext(options.get("filename", ""))[1].lower()
+                file_path = self.service.save_upload(self.rfile, length, extension)
+                uploaded = True
+
+            language = options.get("language")
+            try:
+                request_id = self.service.submit(
+                    model_size=transcriber.model_name(options.get("model", "base"),
+                                                      options.get("backend") or "fp32"),
+                    file_path=file_path,
+                    url=options.get("url"),
+                    language=None if language in (None, "", "auto") else language,
+                    translate=_flag(options.get("translate")),
+                    vad=_flag(options.get("vad")),
+                    upload=uploaded)
+            except Exception:
+                if uploaded:
+                    discard_upload(file_path)
+                raise
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        self._send_json(202, {"id": request_id, "state": "queued",
+                              "queue_depth": self.service.queue_depth()})
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, preload=(), use_cache=True):
+    store = AudioStore()
+    service = TranscriptionService(cache=TranscriptCache() if use_cache else None,
+                                   store=store, detector=LanguageDetector(store=store))
+    for model_size in preload:
+        service.models.preload(model_size)
+
+    handler = type("Handler", (RequestHandler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving on http://{host}:{httpd.server_address[1]} (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        print(service.format_stats())
+        print(service.models.format_stats())
+
+
+def add_arguments(parser):
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--preload", nargs="*", default=["base"],
+                        help="models to load at startup, e.g. base or base-int8")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always transcribe, ignoring cached transcripts")
+    parser.add_argument("--metrics", action="store_true",
+                        help="collect per-stage timings and serve them at GET /metrics")
+    parser.add_argument("--metrics-log", default=None,
+                        help="also append per-stage timing spans to this JSON-lines file")
+
+
+def main(args):
+    for name in args.preload:
+        if transcriber.parse_model_name(name)[0] not in MODEL_SIZES:
+            print(f"Error: unknown model '{name}'")
+            sys.exit(1)
+    if args.metrics or args.metrics_log:
+        metrics.configure(args.metrics_log)
+    serve(args.host, args.port, preload=args.preload, use_cache=not args.no_cache)
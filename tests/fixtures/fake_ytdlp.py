@@ -0,0 +1,85 @@
+"""Offline stand-in for yt-dlp that serves a fixture file.
+
+Understands the options downloads.py passes: -o TEMPLATE (or "-" for
+stdout), --print WHEN:TEMPLATE with a %(.{fields})j JSON template, and the
+URL. The fixture is taken from FAKE_YTDLP_FIXTURE; FAKE_YTDLP_DELAY adds a
+pause before the download finishes so concurrent runs interleave.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+
+args = sys.argv[1:]
+output = None
+prints = []
+url = None
+i = 0
+while i < len(args):
+    if args[i] == "-o":
+        output = args[i + 1]
+        i += 2
+    elif args[i] == "--print":
+        prints.append(args[i + 1])
+        i += 2
+    elif args[i] == "-f":
+        i += 2
+    elif args[i].startswith("-"):
+        i += 1
+    else:
+        url = args[i]
+        i += 1
+
+fixture = os.environ["FAKE_YTDLP_FIXTURE"]
+match = re.search(r"([A-Za-z0-9_-]{11})$", url or "")
+if not match:
+    sys.stderr.write(f"ERROR: Unsupported URL: {url}\n")
+    sys.exit(1)
+video_id = match.group(1)
+info = {
+    "id": video_id,
+    "title": f"Fixture {video_id}",
+    "ext": os.path.splitext(fixture)[1].lstrip("."),
+    "duration": 3.0,
+}
+
+
+def render(template):
+    # Only the JSON field-set form is needed here
+    def field_set(match):
+        fields = match.group(1).split(",")
+        return json.dumps({field: info.get(field) for field in fields})
+    text = re.sub(r"%\(\.\{([^}]*)\}\)j", field_set, template)
+    return (text.replace("%(id)s", info["id"]).replace("%(ext)s", info["ext"])
+            .replace("%(title).100s", info["title"]))
+
+
+def emit(when, stream):
+    for spec in prints:
+        stage, _, template = spec.partition(":")
+        if stage == when:
+            stream.write(render(template) + "\n")
+            stream.flush()
+
+
+delay = float(os.environ.get("FAKE_YTDLP_DELAY", "0"))
+if output == "-":
+    # Media goes to stdout, everything else to stderr
+    emit("before_dl", sys.stderr)
+    with open(fixture, "rb") as f:
+        for block in iter(lambda: f.read(4096), b""):
+            sys.stdout.buffer.write(block)
+    sys.stdout.buffer.flush()
+    sys.exit(0)
+
+emit("before_dl", sys.stdout)
+print(f"[youtube] {video_id}: Downloading webpage")
+path = render(output)
+time.sleep(delay)
+shutil.copyfile(fixture, path + ".part")
+os.replace(path + ".part", path)
+print(f"[download] 100% of {os.path.getsize(path)}B")
+info["filepath"] = os.path.abspath(path)
+emit("after_move", sys.stdout)
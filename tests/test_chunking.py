@@ -0,0 +1,132 @@
+"""Chunk planning and stitching against a sequential transcription, without Whisper"""
+import numpy as np
+import pytest
+
+import chunking
+import vad
+
+SR = 16000
+WORD_SECONDS = 3.0
+WORD_EVERY = 4.0
+
+
+def synthetic_audio(seconds, seed=0):
+    """Tone bursts of WORD_SECONDS every WORD_EVERY seconds with quiet gaps"""
+    rng = np.random.default_rng(seed)
+    audio = (rng.standard_normal(int(seconds * SR)) * 1e-4).astype(np.float32)
+    t = np.arange(int(WORD_SECONDS * SR)) / SR
+    for start in np.arange(0, seconds - WORD_SECONDS, WORD_EVERY):
+        i = int(start * SR)
+        audio[i:i + len(t)] += (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    return audio
+
+
+def sequential_segments(seconds):
+    """What one pass over the whole recording would return: one segment per burst"""
+    return [{"start": float(start), "end": float(start + WORD_SECONDS), "text": f" word{i}"}
+            for i, start in enumerate(np.arange(0, seconds - WORD_SECONDS, WORD_EVERY))]
+
+
+def transcribe_chunk(segments, chunk_start, chunk_end):
+    """Stand-in for Whisper on one chunk: every segment the chunk overlaps,
+    clipped to it and relative to its start"""
+    result = []
+    for segment in segments:
+        if segment["end"] <= chunk_start or segment["start"] >= chunk_end:
+            continue
+        result.append({"start": max(segment["start"], chunk_start) - chunk_start,
+                       "end": min(segment["end"], chunk_end) - chunk_start,
+                       "text": segment["text"]})
+    return result
+
+
+def stitched_text(seconds, chunk_seconds, overlap_seconds):
+    audio = synthetic_audio(seconds)
+    reference = sequential_segments(seconds)
+    chunks = chunking.plan_chunks(audio, SR, chunk_seconds, overlap_seconds)
+    results = []
+    for start, end in chunks:
+        start_s, end_s = start / SR, end / SR
+        results.append((start_s, end_s, transcribe_chunk(reference, start_s, end_s)))
+    merged = chunking.stitch_segments(results)
+    return "".join(s["text"] for s in merged), "".join(s["text"] for s in reference), merged
+
+
+def test_plan_chunks_covers_audio_with_overlap():
+    audio = synthetic_audio(250)
+    chunks = chunking.plan_chunks(audio, SR, chunk_seconds=60, overlap_seconds=5)
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(audio)
+    for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+        # Each chunk runs exactly the overlap past the next one's start
+        assert end == next_start + 5 * SR
+    assert len(chunks) >= 3
+
+
+def test_split_points_land_in_quiet_gaps():
+    audio = synthetic_audio(250)
+    energy = vad.frame_energy_db(audio, SR)
+    frame = int(vad.FRAME_SECONDS * SR)
+    for point in chunking.find_split_points(audio, SR, chunk_seconds=60, search_seconds=5):
+        assert energy[point // frame] < -60
+
+
+def test_split_points_match_whole_file_energy():
+    # Windowed energy must pick the same frames as energy over the whole file
+    audio = synthetic_audio(250, seed=3)
+    energy = vad.frame_energy_db(audio, SR)
+    frame = int(vad.FRAME_SECONDS * SR)
+    chunk, search = 60 * SR, 5 * SR
+    expected = []
+    target = chunk
+    while target < len(audio) - max(search, chunk // 4):
+        lo, hi = (target - search) // frame, (target + search) // frame
+        target = (lo + int(np.argmin(energy[lo:hi]))) * frame + frame // 2
+        expected.append(target)
+        target += chunk
+    assert chunking.find_split_points(audio, SR, 60, 5) == expected
+
+
+def test_stitched_text_matches_sequential():
+    stitched, sequential, merged = stitched_text(250, chunk_seconds=60, overlap_seconds=10)
+    assert stitched == sequential
+    assert [s["id"] for s in merged] == list(range(len(merged)))
+
+
+def test_overlap_offsets_are_rebased():
+    _, _, merged = stitched_text(250, chunk_seconds=60, overlap_seconds=10)
+    reference = sequential_segments(250)
+    assert [(s["start"], s["end"]) for s in merged] == \
+        [pytest.approx((s["start"], s["end"])) for s in reference]
+
+
+def test_segment_crossing_boundary_kept_once():
+    # A segment spanning the split appears clipped in both chunks
+    segment = {"start": 58.0, "end": 62.0, "text": " across"}
+    results = [
+        (0.0, 70.0, [{"start": 50.0, "end": 54.0, "text": " before"}, dict(segment)]),
+        (60.0, 120.0, [{"start": 0.0, "end": 2.0, "text": " across"},
+                       {"start": 5.0, "end": 8.0, "text": " after"}]),
+    ]
+    merged = chunking.stitch_segments(results)
+    assert [s["text"] for s in merged] == [" before", " across", " after"]
+    assert merged[1]["start"] == 58.0 and merged[1]["end"] == 62.0
+    assert merged[2]["start"] == 65.0
+
+
+def test_later_chunk_wins_after_handover():
+    # Past the middle of the overlap (65s here) the earlier chunk's segments are dropped
+    results = [
+        (0.0, 70.0, [{"start": 66.0, "end": 69.0, "text": " early copy"}]),
+        (60.0, 120.0, [{"start": 6.0, "end": 9.0, "text": " late copy"}]),
+    ]
+    assert [s["text"] for s in chunking.stitch_segments(results)] == [" late copy"]
+
+
+def test_first_speech_skips_leading_silence():
+    audio = np.zeros(20 * SR, dtype=np.float32)
+    t = np.arange(5 * SR) / SR
+    audio[12 * SR:17 * SR] = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    clip = chunking.first_speech(audio, SR, seconds=3)
+    assert len(clip) == 3 * SR
+    assert np.abs(clip).max() > 0.1
@@ -0,0 +1,174 @@
+"""download_audio and stream_audio against the stand-in yt-dlp in fixtures/"""
+import os
+import sys
+import time
+import wave
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import downloads
+import transcriber
+
+FAKE_YTDLP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "fake_ytdlp.py")
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="stand-in is run as a script")
+
+
+@pytest.fixture
+def fixture_wav(tmp_path):
+    path = tmp_path / "fixture.wav"
+    t = np.arange(3 * 16000) / 16000
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(samples.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def fake_ytdlp(tmp_path, fixture_wav, monkeypatch):
+    script = tmp_path / "yt-dlp"
+    script.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_YTDLP}" "$@"\n')
+    script.chmod(0o755)
+    monkeypatch.setattr(downloads, "YTDLP", str(script))
+    monkeypatch.setenv("FAKE_YTDLP_FIXTURE", fixture_wav)
+    return str(script)
+
+
+def url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def test_download_audio_returns_reported_path(fake_ytdlp, fixture_wav, tmp_path):
+    out = tmp_path / "downloads"
+    audio_file, title = downloads.download_audio(url("abcdefghijk"), str(out),
+                                                 filename_template="%(id)s.%(ext)s")
+    assert audio_file == str(out / "abcdefghijk.wav")
+    assert title == "Fixture abcdefghijk"
+    with open(audio_file, "rb") as a, open(fixture_wav, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_concurrent_downloads_keep_their_own_files(fake_ytdlp, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_YTDLP_DELAY", "0.2")
+    out = str(tmp_path / "downloads")
+    ids = [f"video{i:06d}" for i in range(6)]
+    with ThreadPoolExecutor(max_workers=len(ids)) as executor:
+        results = list(executor.map(lambda v: downloads.download_audio(url(v), out), ids))
+    for video_id, (audio_file, title) in zip(ids, results):
+        assert os.path.basename(audio_file) == f"Fixture {video_id} [{video_id}].wav"
+        assert os.path.exists(audio_file)
+        assert title == f"Fixture {video_id}"
+
+
+def test_download_error_is_reported(fake_ytdlp, tmp_path):
+    with pytest.raises(Exception, match="yt-dlp error"):
+        downloads.download_audio("https://example.com/nothing", str(tmp_path))
+
+
+def _raw_windows(file_path, window_seconds, stdin=None):
+    # ffmpeg stand-in: the WAV payload as int16 samples in one window
+    data = stdin.read()
+    yield np.frombuffer(data[44:], np.int16).astype(np.float32) / 32768.0
+
+
+def test_stream_audio_reads_metadata_and_tees(fake_ytdlp, fixture_wav, tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, "iter_audio_windows", _raw_windows)
+    info = {}
+    save_path = str(tmp_path / "saved.part")
+    windows = list(downloads.stream_audio(url("streamid000"), info=info, save_path=save_path))
+    assert info == {"id": "streamid000", "title": "Fixture streamid000", "ext": "wav",
+                    "duration": 3.0}
+    assert sum(len(w) for w in windows) == 3 * 16000
+    with open(save_path, "rb") as a, open(fixture_wav, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_stream_audio_without_save_path(fake_ytdlp, monkeypatch):
+    monkeypatch.setattr(transcriber, "iter_audio_windows", _raw_windows)
+    info = {}
+    windows = list(downloads.stream_audio(url("streamid001"), info=info))
+    assert info["id"] == "streamid001"
+    assert sum(len(w) for w in windows) == 3 * 16000
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_stream_audio_decodes_with_ffmpeg(fake_ytdlp):
+    windows = list(downloads.stream_audio(url("streamid002"), window_seconds=1))
+    assert len(windows) == 3
+    assert abs(sum(len(w) for w in windows) - 3 * 16000) < 160
+
+
+def test_stream_audio_error(fake_ytdlp, monkeypatch):
+    monkeypatch.setattr(transcriber, "iter_audio_windows", _raw_windows)
+    with pytest.raises(Exception, match="yt-dlp error"):
+        list(downloads.stream_audio("https://example.com/nothing"))
+
+
+def test_is_url_ignores_local_paths(tmp_path, monkeypatch):
+    import batch
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("youtube_rips")
+    open(os.path.join("youtube_rips", "a.wav"), "wb").close()
+    open("my_youtube_talk.wav", "wb").close()
+    assert not downloads.is_url("youtube_rips")
+    assert not downloads.is_url("my_youtube_talk.wav")
+    assert downloads.is_url("https://example.com/a.mp3")
+    assert downloads.is_url("youtu.be/abcdefghijk")
+    assert batch.collect_inputs(["youtube_rips", "my_youtube_talk.wav"]) == \
+        [os.path.join("youtube_rips", "a.wav"), "my_youtube_talk.wav"]
+
+
+def test_fetch_counts_one_lookup(fake_ytdlp, tmp_path):
+    cache = downloads.DownloadCache(str(tmp_path / "cache"))
+    first = cache.fetch(url("abcdefghijk"))
+    second = cache.fetch(url("abcdefghijk"))
+    assert first == second
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_held_downloads_are_not_evicted(fake_ytdlp, tmp_path):
+    # Room for one fixture only
+    cache = downloads.DownloadCache(str(tmp_path / "cache"), max_mb=0.1)
+    held, _ = cache.fetch(url("heldvideo00"), hold=True)
+    other, _ = cache.fetch(url("othervideo0"))
+    assert os.path.exists(held) and os.path.exists(other)
+    cache.release(url("heldvideo00"))
+    cache.fetch(url("thirdvideo0"))
+    assert not os.path.exists(held)
+
+
+def test_queue_prefetches_only_ahead_of_consumer(tmp_path):
+    fetched = []
+
+    class Cache:
+        def fetch(self, source, status_callback=None, hold=False):
+            fetched.append(source)
+            return str(tmp_path / source[-11:]), source
+
+        def release(self, source):
+            pass
+
+    sources = [url(f"video{i:06d}") for i in range(10)]
+    inputs = downloads.DownloadQueue(Cache(), prefetch=2).iter_inputs(sources)
+    next(inputs)
+    time.sleep(0.2)
+    # The one being consumed plus `prefetch` queued behind it
+    assert len(fetched) == 3
+    assert len(list(inputs)) == 9
+
+
+def test_stale_partials_are_removed(tmp_path):
+    cache_dir = str(tmp_path / "downloads")
+    cache = downloads.DownloadCache(cache_dir)
+    stale, fresh = cache.new_partial(), cache.new_partial()
+    old = time.time() - downloads.STALE_PARTIAL_SECONDS - 60
+    os.utime(stale, (old, old))
+    downloads.DownloadCache(cache_dir)
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
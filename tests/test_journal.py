@@ -0,0 +1,71 @@
+"""Journal recovery after a crash"""
+import os
+
+import journal
+
+HEADER = {"source": "talk.wav", "model": "base"}
+
+
+def outputs(tmp_path):
+    return {"txt": str(tmp_path / "talk_transcript.txt"), "srt": str(tmp_path / "talk.srt")}
+
+
+def start(path, paths):
+    job = journal.Journal(path, HEADER)
+    job.record_outputs(paths)
+    for output in paths.values():
+        with open(output, "w", encoding="utf-8") as f:
+            f.write("partial")
+    return job
+
+
+def test_resumes_after_last_checkpoint(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    paths = outputs(tmp_path)
+    job = start(path, paths)
+    job.append_segment({"start": 0.0, "end": 1.0, "text": " one"})
+    job.checkpoint({"seek": 1})
+    job.append_segment({"start": 1.0, "end": 2.0, "text": " two"})
+    job.close()
+    with open(path, "ab") as f:
+        f.write(b'{"segment": {"start"')
+
+    resumed = journal.Journal(path, HEADER)
+    assert resumed.resumed
+    assert resumed.state == {"seek": 1}
+    assert [s["text"] for s in resumed.segments] == [" one"]
+    assert resumed.outputs == paths
+    assert all(os.path.exists(output) for output in paths.values())
+
+
+def test_outputs_before_first_checkpoint_are_deleted(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    paths = outputs(tmp_path)
+    job = start(path, paths)
+    job.append_segment({"start": 0.0, "end": 1.0, "text": " one"})
+    job.close()
+
+    restarted = journal.Journal(path, HEADER)
+    assert not restarted.resumed
+    assert restarted.outputs is None
+    assert not any(os.path.exists(output) for output in paths.values())
+
+
+def test_other_header_starts_over(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    job = start(path, outputs(tmp_path))
+    job.checkpoint({"seek": 1})
+    job.close()
+
+    other = journal.Journal(path, dict(HEADER, model="small"))
+    assert not other.resumed
+    assert other.segments == []
+
+
+def test_discard_removes_job_journal(tmp_path):
+    path = journal.job_journal_path(7, str(tmp_path))
+    journal.Journal(path, journal.url_header("https://youtu.be/abcdefghijk", "base")).close()
+    assert os.path.exists(path)
+    journal.discard(7, str(tmp_path))
+    journal.discard(7, str(tmp_path))
+    assert not os.path.exists(path)
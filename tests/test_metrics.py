@@ -0,0 +1,64 @@
+"""Metrics collected in worker processes and merged into the parent"""
+from lru import HitCounter
+from metrics import Metrics
+
+
+class Cache(HitCounter):
+    pass
+
+
+def worker_metrics(hits, misses):
+    worker = Metrics()
+    worker.configure()
+    cache = Cache()
+    for _ in range(hits):
+        cache.count_lookup(True)
+    for _ in range(misses):
+        cache.count_lookup(False)
+    worker.register("transcript_cache", cache.stats)
+    return worker, cache
+
+
+def test_drain_hands_over_each_span_once():
+    worker, _ = worker_metrics(1, 1)
+    parent = Metrics()
+    parent.configure()
+    with worker.span("decode"):
+        pass
+    parent.merge(worker.drain())
+    with worker.span("decode"):
+        pass
+    worker.count("chunks", 3)
+    parent.merge(worker.drain())
+    parent.merge(None)
+
+    snapshot = parent.snapshot()
+    [summary] = snapshot["summaries"]
+    assert summary["name"] == "stage_seconds"
+    assert summary["labels"] == {"stage": "decode"}
+    assert summary["count"] == 2
+    assert snapshot["counters"] == [{"name": "chunks", "labels": {}, "value": 3}]
+    assert worker.drain()["summaries"] == []
+
+
+def test_cache_stats_are_summed_across_workers():
+    parent = Metrics()
+    parent.configure()
+    local = Cache()
+    local.count_lookup(False)
+    parent.register("transcript_cache", local.stats)
+
+    first, first_cache = worker_metrics(2, 0)
+    second, _ = worker_metrics(1, 1)
+    snapshot = first.drain()
+    parent.merge(snapshot)
+    # Later stats from the same worker replace its earlier ones
+    first_cache.count_lookup(True)
+    parent.merge(first.drain())
+    parent.merge(dict(second.drain(), pid=snapshot["pid"] + 1))
+
+    stats = parent.snapshot()["components"]["transcript_cache"]
+    assert stats["hits"] == 4
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == 4 / 6
+    assert "transcriber_transcript_cache_hits 4.0" in parent.prometheus()
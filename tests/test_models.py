@@ -0,0 +1,46 @@
+"""ModelRegistry loading, sharing and eviction with stub models"""
+import threading
+
+import pytest
+
+from models import ModelRegistry
+
+
+class StubModel:
+    def __init__(self, size_error=False):
+        self.size_error = size_error
+
+    def state_dict(self):
+        if self.size_error:
+            raise RuntimeError("no state dict")
+        return {}
+
+
+def test_concurrent_gets_share_one_load():
+    loaded = []
+    release = threading.Event()
+
+    def loader(name):
+        release.wait(5)
+        loaded.append(name)
+        return StubModel()
+
+    registry = ModelRegistry(loader=loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("base")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert loaded == ["base"]
+    assert len(results) == 4 and all(r is results[0] for r in results)
+
+
+def test_failure_after_load_reaches_every_waiter():
+    registry = ModelRegistry(loader=lambda name: StubModel(size_error=True))
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="no state dict"):
+            registry.get("base")
+    assert not registry.is_loaded("base")
@@ -0,0 +1,147 @@
+"""The HTTP API end to end on a local port, with a stub model in the registry"""
+import os
+import json
+import time
+import wave
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import server
+import downloads
+import transcriber
+from models import ModelRegistry
+
+
+class StubModel:
+    def __init__(self):
+        self.calls = 0
+
+    def state_dict(self):
+        return {}
+
+    def transcribe(self, audio, **options):
+        self.calls += 1
+        duration = len(audio) / transcriber.SAMPLE_RATE
+        return {"text": " stub transcript", "language": options.get("language", "en"),
+                "segments": [{"id": 0, "start": 0.0, "end": duration, "text": " stub transcript"}]}
+
+
+def _read_wav(file_path, store=None):
+    with wave.open(file_path, "rb") as f:
+        samples = np.frombuffer(f.readframes(f.getnframes()), np.int16)
+    return samples.astype(np.float32) / 32768.0
+
+
+@pytest.fixture
+def wav_bytes(tmp_path):
+    path = tmp_path / "fixture.wav"
+    t = np.arange(2 * 16000) / 16000
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(samples.tobytes())
+    return path.read_bytes()
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, "load_audio", _read_wav)
+    model = StubModel()
+    service = server.TranscriptionService(
+        models=ModelRegistry(loader=lambda name: model),
+        download_cache=downloads.DownloadCache(str(tmp_path / "downloads")),
+        upload_dir=str(tmp_path / "uploads"))
+    service.stub_model = model
+    return service
+
+
+@pytest.fixture
+def base_url(service):
+    handler = type("Handler", (server.RequestHandler,), {"service": service})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def call(url, body=None, content_type="application/json"):
+    request = urllib.request.Request(url, data=body)
+    if body is not None:
+        request.add_header("Content-Type", content_type)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_done(base_url, request_id):
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        status, body = call(f"{base_url}/requests/{request_id}")
+        assert status == 200
+        if body["state"] in ("done", "failed"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError("request did not finish")
+
+
+def test_upload_is_transcribed_and_deleted(base_url, service, wav_bytes):
+    status, body = call(f"{base_url}/transcribe?model=base&filename=talk.wav", wav_bytes,
+                        "application/octet-stream")
+    assert status == 202
+    done = wait_done(base_url, body["id"])
+    assert done["state"] == "done", done["error"]
+    assert done["text"] == "stub transcript"
+    assert done["duration"] == pytest.approx(2.0)
+
+    status, segments = call(f"{base_url}/requests/{body['id']}/segments")
+    assert status == 200
+    assert [s["text"] for s in segments["segments"]] == [" stub transcript"]
+    assert os.listdir(service.upload_dir) == []
+
+
+def test_model_is_loaded_once(base_url, service, wav_bytes):
+    ids = [call(f"{base_url}/transcribe?filename=talk.wav", wav_bytes,
+                "application/octet-stream")[1]["id"] for _ in range(3)]
+    for request_id in ids:
+        done = wait_done(base_url, request_id)
+        assert done["state"] == "done", done["error"]
+    assert service.stub_model.calls == 3
+    assert service.models.stats()["loads"] == 1
+    assert os.listdir(service.upload_dir) == []
+
+
+def test_local_path_is_kept(base_url, tmp_path, wav_bytes):
+    path = tmp_path / "local.wav"
+    path.write_bytes(wav_bytes)
+    status, body = call(f"{base_url}/transcribe", json.dumps({"path": str(path)}).encode())
+    assert status == 202
+    done = wait_done(base_url, body["id"])
+    assert done["state"] == "done", done["error"]
+    assert path.exists()
+
+
+def test_non_youtube_url_is_rejected(base_url, service):
+    status, body = call(f"{base_url}/transcribe",
+                        json.dumps({"url": "file:///etc/passwd"}).encode())
+    assert status == 400
+    assert "YouTube" in body["error"]
+    assert service.queue_depth() == 0
+
+
+def test_bad_requests(base_url, service):
+    assert call(f"{base_url}/transcribe", json.dumps({"model": "huge"}).encode())[0] == 400
+    assert call(f"{base_url}/requests/nope")[0] == 404
+    assert call(f"{base_url}/health") == (200, {"status": "ok"})
+    stats = call(f"{base_url}/stats")[1]
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,517 @@
+import numpy as np
+import os
+import re
+import subprocess
+import time
+
+import vad as vad_filter
+import quantize
+import lowmem
+from cache import file_digest
+from metrics import metrics
+
+# Whisper's input rate; kept here so importing this module doesn't pull in
+# whisper and torch, which are imported on first use instead
+SAMPLE_RATE = 16000
+
+# Length of audio handed to Whisper per step in streaming mode
+STREAM_WINDOW_SECONDS = 60
+
+MEDIA_EXTENSIONS = (
+    ".mp3", ".mp4", ".wav", ".m4a", ".flac", ".ogg", ".aac",
+    ".webm", ".mkv", ".avi", ".mov", ".wmv", ".flv",
+)
+
+
+# Inference backends; a model name is the size plus "-<backend>" unless fp32.
+# mmap and bf16 map the checkpoint instead of reading it (see lowmem)
+BACKENDS = ("fp32", "int8", "mmap", "bf16")
+
+
+def model_name(model_size, backend="fp32"):
+    """Name under which a size/backend pair is loaded, cached and shown"""
+    return model_size if backend == "fp32" else f"{model_size}-{backend}"
+
+
+def parse_model_name(name):
+    """(model_size, backend) for a name made by model_name"""
+    size, _, backend = name.rpartition("-")
+    if size and backend in BACKENDS:
+        return size, backend
+    return name, "fp32"
+
+
+def load_model(model_size="base"):
+    """Load a Whisper model by name, e.g. "base" or "base-int8" """
+    import whisper
+    size, backend = parse_model_name(model_size)
+    try:
+        with metrics.span("model_load", model=model_size) as span:
+            if backend == "int8":
+                model = quantize.load_int8(size)
+            elif backend in ("mmap", "bf16"):
+                model = lowmem.load_mmap(size, "bf16" if backend == "bf16" else "fp32")
+            else:
+                model = whisper.load_model(size)
+            if span is not None:
+                span.fields.update(lowmem.memory_usage())
+            return model
+    except Exception as e:
+        raise Exception(f"Failed to load model: {str(e)}")
+
+
+def format_timestamp(seconds):
+    return f"{int(seconds//60):02d}:{int(seconds%60):02d}"
+
+
+def format_segment(segment, timestamps=False):
+    """Text for one segment, matching what format_result produces for it"""
+    if not timestamps:
+        return segment.get("text", "")
+    start = segment.get("start", 0)
+    end = segment.get("end", 0)
+    text = segment.get("text", "").strip()
+    return f"[{format_timestamp(start)} - {format_timestamp(end)}] {text}\n"
+
+
+def format_result(result, timestamps=False):
+    """Turn a Whisper result dict into the transcript text shown to the user"""
+    if not timestamps or not result.get("segments"):
+        return result["text"]
+
+    lines = [format_segment(segment, timestamps) for segment in result["segments"]]
+    return "".join(lines) if lines else result["text"]
+
+
+def load_audio(file_path, store=None):
+    """Decoded 16 kHz mono audio, memory-mapped from the store when given"""
+    with metrics.span("decode", store=store is not None):
+        if store is not None:
+            return store.load(file_path)
+        import whisper
+        return whisper.load_audio(file_path)
+
+
+def prepare_audio(file_path, vad=False, store=None):
+    """Decode file_path for inference.
+
+    Returns (audio, duration, timeline). With vad=True silence is cut out of
+    audio and timeline maps its times back to the original; otherwise
+    timeline is None.
+    """
+    audio = load_audio(file_path, store)
+    duration = len(audio) / SAMPLE_RATE
+    timeline = None
+    if vad:
+        audio, spans = vad_filter.remove_silence(audio, SAMPLE_RATE)
+        timeline = vad_filter.Timeline()
+        for original_start, span_duration in spans:
+            timeline.append(original_start, span_duration)
+    return audio, duration, timeline
+
+
+def finish_result(result, audio, duration, timeline=None):
+    """Add "duration" (and "speech_duration" with VAD) to a result for audio
+    from prepare_audio, mapping segment times back to the original"""
+    result["duration"] = duration
+    if timeline is not None:
+        vad_filter.remap_segments(result["segments"], timeline)
+        result["speech_duration"] = len(audio) / SAMPLE_RATE
+    return result
+
+
+def transcribe_file(model, file_path, language=None, translate=False, vad=False, store=None):
+    """Transcribe one file with an already loaded model.
+
+    Returns the Whisper result dict with an extra "duration" key holding the
+    length of the decoded audio in seconds. With vad=True silence is cut out
+    before inference, segment times are mapped back to the original audio and
+    "speech_duration" holds the length that was actually transcribed.
+    """
+    try:
+        audio, duration, timeline = prepare_audio(file_path, vad, store)
+        if timeline is not None and not len(audio):
+            return {"text": "", "segments": [], "language": language,
+                    "duration": duration, "speech_duration": 0.0}
+
+        # Simple transcription with minimal options for reliability
+        transcribe_options = {
+            "verbose": False,
+            "task": "translate" if translate else "transcribe",
+        }
+
+        # Only set language if not auto-detect
+        if language:
+            transcribe_options["language"] = language
+
+        with metrics.span("transcribe", audio_seconds=len(audio) / SAMPLE_RATE):
+            result = model.transcribe(audio, **transcribe_options)
+        return finish_result(result, audio, duration, timeline)
+
+    except Exception as e:
+        raise Exception(f"Transcription failed: {str(e)}")
+
+
+def transcribe_cached(get_model, file_path, model_size, language=None, translate=False,
+                      cache=None, status_callback=None, vad=False, store=None, detector=None):
+    """Transcribe through the transcript cache.
+
+    get_model is only called on a cache miss, so cached inputs never pay for
+    loading the model. Without a language, a langid.LanguageDetector picks
+    one first when given.
+    """
+    digest = _content_digest(file_path, language, cache, detector)
+    if language is None and detector is not None:
+        language = detector.resolve(file_path, status_callback, digest)
+    key = None
+    if cache is not None:
+        task = "translate" if translate else "transcribe"
+        key = cache.make_key(file_path, model_size, language, task, vad, digest=digest)
+        result = cache.get(key)
+        if result is not None:
+            if status_callback:
+                status_callback("Found cached transcript, skipping transcription")
+            return result
+
+    result = transcribe_file(get_model(), file_path, language, translate, vad, store)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+def _content_digest(file_path, language, cache, detector):
+    # The file is hashed once for both the language and the transcript cache
+    if cache is not None or (language is None and detector is not None
+                             and detector.cache is not None):
+        return file_digest(file_path)
+    return None
+
+
+def probe_duration(file_path):
+    """Media duration in seconds according to ffprobe, or None if unknown"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        file_path,
+    ]
+    try:
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        return float(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+
+    # Not every ffmpeg install ships ffprobe; fall back to ffmpeg's banner
+    try:
+        banner = subprocess.run(["ffmpeg", "-nostdin", "-i", file_path],
+                                capture_output=True, text=True).stderr
+    except OSError:
+        return None
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", banner)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def iter_audio_windows(file_path, window_seconds=STREAM_WINDOW_SECONDS, stdin=None):
+    """Decode a file with ffmpeg and yield it as float32 arrays of
+    window_seconds each, without holding the whole file in memory.
+
+    Pass file_path="pipe:0" and a readable pipe as stdin to decode a stream.
+    """
+    cmd = [
+        "ffmpeg", "-loglevel", "error",
+        "-threads", "0",
+        "-i", file_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-",
+    ]
+    if stdin is None:
+        cmd.insert(1, "-nostdin")
+    window_bytes = int(window_seconds * SAMPLE_RATE) * 2
+    try:
+        process = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise Exception(f"Failed to start ffmpeg: {str(e)}")
+
+    decoded_any = False
+    try:
+        while True:
+            data = process.stdout.read(window_bytes)
+            data = data[:len(data) - len(data) % 2]
+            if not data:
+                break
+            decoded_any = True
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        stderr = process.stderr.read().decode(errors="replace")
+        process.stderr.close()
+        process.wait()
+
+    if not decoded_any:
+        raise Exception(f"Failed to load audio: {stderr.strip() or 'no audio stream'}")
+
+
+def iter_array_windows(audio, window_seconds=STREAM_WINDOW_SECONDS):
+    """Yield consecutive window_seconds views of already decoded audio"""
+    window = int(window_seconds * SAMPLE_RATE)
+    for start in range(0, len(audio), window):
+        yield audio[start:start + window]
+
+
+def _with_lookahead(iterable):
+    # Yields (item, is_last) pairs
+    iterator = iter(iterable)
+    try:
+        current = next(iterator)
+    except StopIteration:
+        return
+    for following in iterator:
+        yield current, False
+        current = following
+    yield current, True
+
+
+def stream_segments(model, windows, language=None, translate=False, duration=None,
+                    vad=False, stats=None, journal=None):
+    """Transcribe audio windows one by one, yielding (segment, progress).
+
+    The last segment of every window except the final one is held back and
+    its audio carried into the next window, so sentences cut at a window
+    boundary are transcribed whole. Segment times are on the original
+    timeline. progress is the fraction of audio processed, or None when the
+    duration is unknown.
+
+    With vad=True silence is cut from each window before it is buffered. If a
+    stats dict is given, "audio_seconds" and "speech_seconds" are kept up to
+    date in it.
+
+    With a journal.Journal every segment is appended to it and a checkpoint
+    written after each window. If the journal holds a checkpoint already,
+    the windows before it are skipped (only the audio carried over past it
+    is rebuilt) and decoding continues exactly where it stopped; the
+    journaled segments themselves are not yielded again.
+    """
+    import torch
+
+    transcribe_options = {
+        "verbose": False,
+        "task": "translate" if translate else "transcribe",
+    }
+    if language:
+        transcribe_options["language"] = language
+    if stats is None:
+        stats = {}
+    stats["audio_seconds"] = 0.0
+    stats["speech_seconds"] = 0.0
+
+    buffer = np.zeros(0, dtype=np.float32)
+    timeline = vad_filter.Timeline()  # maps buffer time to original time
+    window_end = 0.0
+    previous_text = None
+    # buffer holds the windows from carry_window on, less carry_offset samples
+    carry_window = 0
+    carry_offset = 0
+    window_lengths = {}  # index -> samples each buffered window added
+    resume_window = 0
+
+    state = journal.state if journal is not None else None
+    if state:
+        resume_window = state["window"]
+        carry_window = state["carry_window"]
+        carry_offset = state["carry_offset"]
+        (timeline.starts, timeline.original_starts,
+         timeline.durations, timeline.length) = state["timeline"]
+        window_end = state["window_end"]
+        previous_text = state["previous_text"]
+        if state["language"]:
+            transcribe_options["language"] = state["language"]
+        stats.update(state["stats"])
+
+    for index, (window, is_last) in enumerate(_with_lookahead(windows)):
+        if index < resume_window:
+            # Transcribed before the checkpoint; only rebuild the carried audio
+            if index >= carry_window:
+                if vad:
+                    window, _ = vad_filter.remove_silence(window, SAMPLE_RATE)
+                window_lengths[index] = len(window)
+                buffer = np.concatenate([buffer, window])
+            if index == resume_window - 1:
+                buffer = buffer[carry_offset:]
+            continue
+
+        window_start = window_end
+        window_end += len(window) / SAMPLE_RATE
+        if vad:
+            window, spans = vad_filter.remove_silence(window, SAMPLE_RATE, offset=window_start)
+        else:
+            spans = [(window_start, len(window) / SAMPLE_RATE)]
+        for original_start, span_duration in spans:
+            timeline.append(original_start, span_duration)
+        window_lengths[index] = len(window)
+        buffer = np.concatenate([buffer, window])
+        stats["audio_seconds"] = window_end
+        stats["speech_seconds"] += len(window) / SAMPLE_RATE
+
+        if not len(buffer):
+            continue
+        # Seeded per window so temperature fallback samples the same way
+        # when a window is decoded again after a resume
+        torch.manual_seed(index)
+        with metrics.span("transcribe", audio_seconds=len(buffer) / SAMPLE_RATE, window=index):
+            result = model.transcribe(buffer, initial_prompt=previous_text, **transcribe_options)
+
+        # Keep the language fixed once it has been detected
+        if "language" not in transcribe_options and result.get("language"):
+            transcribe_options["language"] = result["language"]
+
+        segments = result["segments"]
+        if not is_last and len(segments) > 1:
+            emitted = segments[:-1]
+            cut = int(segments[-1]["start"] * SAMPLE_RATE)
+        else:
+            emitted = segments
+            cut = len(buffer)
+
+        if cut < len(buffer):
+            consumed = timeline.to_original(cut / SAMPLE_RATE)
+        else:
+            consumed = window_end
+        progress = min(consumed / duration, 1.0) if duration else None
+        for segment in emitted:
+            segment = dict(segment)
+            segment["start"] = timeline.to_original(segment["start"])
+            segment["end"] = timeline.to_original(segment["end"], end=True)
+            segment["language"] = transcribe_options.get("language")
+            if journal is not None:
+                journal.append_segment(segment)
+            yield segment, progress
+            previous_text = segment["text"]
+
+        buffer = buffer[cut:]
+        timeline.drop_before(cut / SAMPLE_RATE)
+        carry_offset += cut
+        while carry_window <= index and carry_offset >= window_lengths[carry_window]:
+            carry_offset -= window_lengths.pop(carry_window)
+            carry_window += 1
+
+        if journal is not None:
+            journal.checkpoint({
+                "window": index + 1,
+                "carry_window": carry_window,
+                "carry_offset": carry_offset,
+                "timeline": [timeline.starts, timeline.original_starts,
+                             timeline.durations, timeline.length],
+                "window_end": window_end,
+                "previous_text": previous_text,
+                "language": transcribe_options.get("language"),
+                "stats": {"audio_seconds": stats["audio_seconds"],
+                          "speech_seconds": stats["speech_seconds"]},
+            })
+
+
+def _decode_spans(windows):
+    # Times the wait for each window from the ffmpeg pipe as a "decode" span
+    try:
+        while True:
+            with metrics.span("decode", streamed=True):
+                window = next(windows, None)
+            if window is None:
+                return
+            yield window
+    finally:
+        windows.close()
+
+
+def stream_transcribe(get_model, file_path, model_size, language=None, translate=False,
+                      cache=None, status_callback=None, window_seconds=STREAM_WINDOW_SECONDS,
+                      vad=False, stats=None, store=None, detector=None, journal=None):
+    """Streaming counterpart of transcribe_cached, yielding (segment, progress).
+
+    Cached results are replayed at once; otherwise the file is decoded and
+    transcribed window by window and the finished result is cached. With an
+    audio store the windows are views into its memory map instead of an
+    ffmpeg pipe. stats is filled in as described for stream_segments.
+
+    With a journal the run is checkpointed as it goes, and a journal left by
+    an interrupted run is resumed: its segments are replayed first and
+    decoding picks up after its last checkpoint.
+    """
+    if stats is None:
+        stats = {}
+    digest = _content_digest(file_path, language, cache, detector)
+    if language is None and detector is not None:
+        language = detector.resolve(file_path, status_callback, digest)
+    key = None
+    if cache is not None:
+        task = "translate" if translate else "transcribe"
+        # Window-by-window results differ from a whole-file run, so they get their own key
+        key = cache.make_key(file_path, model_size, language, task, vad, streamed=True,
+                             digest=digest)
+        result = cache.get(key)
+        if result is not None:
+            if status_callback:
+                status_callback("Found cached transcript, skipping transcription")
+            stats["audio_seconds"] = result.get("duration", 0.0)
+            stats["speech_seconds"] = result.get("speech_duration", stats["audio_seconds"])
+            for segment in result.get("segments", []):
+                yield segment, 1.0
+            return
+
+    model = get_model()
+    segments = []
+    try:
+        if store is not None:
+            audio = load_audio(file_path, store)
+            duration = len(audio) / SAMPLE_RATE
+            windows = iter_array_windows(audio, window_seconds)
+        else:
+            duration = probe_duration(file_path)
+            windows = _decode_spans(iter_audio_windows(file_path, window_seconds))
+        if journal is not None and journal.resumed:
+            done = journal.state["window_end"]
+            if status_callback:
+                status_callback(f"Resuming after {format_timestamp(done)} "
+                                f"({len(journal.segments)} segments already done)")
+            progress = min(done / duration, 1.0) if duration else None
+            for segment in journal.segments:
+                segments.append(segment)
+                yield segment, progress
+        for segment, progress in stream_segments(model, windows, language, translate, duration,
+                                                 vad=vad, stats=stats, journal=journal):
+            segments.append(segment)
+            yield segment, progress
+    except Exception as e:
+        raise Exception(f"Transcription failed: {str(e)}")
+
+    if cache is not None:
+        cache.put(key, {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": segments[0]["language"] if segments else language,
+            "duration": stats["audio_seconds"],
+            "speech_duration": stats["speech_seconds"],
+        })
+
+
+def transcript_path(title, output_dir="output"):
+    """Timestamped transcript path for title inside output_dir"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+
+    safe_title = "".join(c if c.isalnum() or c in " _-.()" else "_" for c in title)[:100]
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    filename = f"{safe_title}_{timestamp}_transcript.txt"
+    return os.path.join(output_dir, filename)
+
+
+def save_transcript(transcript, title, output_dir="output"):
+    """Write a transcript into output_dir and return its path"""
+    output_file = transcript_path(title, output_dir)
+    with metrics.span("write"), open(output_file, "w", encoding="utf-8") as f:
+        f.write(transcript)
+    return output_file
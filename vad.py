@@ -0,0 +1,152 @@
+"""Energy-based voice activity detection used to skip silence before inference"""
+import bisect
+
+import numpy as np
+
+FRAME_SECONDS = 0.03
+# Frames this many dB above the noise floor count as speech...
+THRESHOLD_ABOVE_FLOOR_DB = 12.0
+# ...but never demand more than this many dB below the loud frames, so audio
+# without any quiet stretch is kept rather than dropped entirely
+THRESHOLD_BELOW_PEAK_DB = 6.0
+# Frames quieter than this are always silence
+MIN_THRESHOLD_DB = -55.0
+
+
+def frame_energy_db(audio, sample_rate):
+    """Energy in dB of consecutive FRAME_SECONDS frames (trailing partial
+    frame ignored)"""
+    frame = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    return 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+
+
+def detect_speech(audio, sample_rate, min_speech=0.25, min_silence=0.5, padding=0.2):
+    """Return (start, end) sample ranges of audio that likely contain speech.
+
+    The threshold adapts to the recording: the noise floor is taken as the
+    10th percentile of frame energies and the loud level as the 90th. Gaps
+    shorter than min_silence are bridged, regions shorter than min_speech
+    dropped, and every region padded by `padding` seconds so word onsets
+    aren't clipped.
+    """
+    frame = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    energy_db = frame_energy_db(audio, sample_rate)
+    floor, loud = np.percentile(energy_db, [10, 90])
+    threshold = min(floor + THRESHOLD_ABOVE_FLOOR_DB, loud - THRESHOLD_BELOW_PEAK_DB)
+    threshold = max(threshold, MIN_THRESHOLD_DB)
+    voiced = energy_db > threshold
+
+    # Runs of voiced frames as [start, end) frame indices
+    edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    regions = []
+    max_gap = min_silence / FRAME_SECONDS
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < max_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    pad = int(padding * sample_rate)
+    min_length = min_speech * sample_rate
+    speech = []
+    for start, end in regions:
+        start = max(0, start * frame - pad)
+        end = min(len(audio), end * frame + pad)
+        if end - start - 2 * pad < min_length:
+            continue
+        if speech and start <= speech[-1][1]:
+            speech[-1] = (speech[-1][0], end)
+        else:
+            speech.append((start, end))
+    return speech
+
+
+class Timeline:
+    """Maps times in concatenated (silence-removed) audio back to the
+    original recording.
+
+    Built from spans of original audio appended in order; each span keeps
+    where it starts in both timelines.
+    """
+
+    def __init__(self):
+        self.starts = []  # span start in the concatenated audio
+        self.original_starts = []
+        self.durations = []
+        self.length = 0.0
+
+    def append(self, original_start, duration):
+        self.starts.append(self.length)
+        self.original_starts.append(original_start)
+        self.durations.append(duration)
+        self.length += duration
+
+    def to_original(self, t, end=False):
+        """Original time for t; with end=True a time on a span boundary maps
+        to the end of the earlier span rather than the start of the next"""
+        if not self.starts:
+            return t
+        search = bisect.bisect_left if end else bisect.bisect_right
+        i = max(search(self.starts, t) - 1, 0)
+        offset = t - self.starts[i]
+        # Clamp into the span so segment ends don't spill into removed silence
+        if i < len(self.starts) - 1:
+            offset = min(offset, self.durations[i])
+        return self.original_starts[i] + offset
+
+    def drop_before(self, t):
+        """Forget the first t seconds of concatenated audio"""
+        starts, original_starts, durations = [], [], []
+        for start, original_start, duration in zip(self.starts, self.original_starts, self.durations):
+            end = start + duration
+            if end <= t:
+                continue
+            skipped = max(t - start, 0.0)
+            starts.append(start + skipped - t)
+            original_starts.append(original_start + skipped)
+            durations.append(duration - skipped)
+        self.starts, self.original_starts, self.durations = starts, original_starts, durations
+        self.length = max(self.length - t, 0.0)
+
+
+def remove_silence(audio, sample_rate, offset=0.0, **kwargs):
+    """Cut silence out of audio.
+
+    Returns (speech_audio, regions) where regions are (original_start,
+    duration) pairs in seconds, shifted by offset, ready for Timeline.append.
+    """
+    regions = detect_speech(audio, sample_rate, **kwargs)
+    if not regions:
+        return audio[:0], []
+    speech = np.concatenate([audio[start:end] for start, end in regions])
+    spans = [(offset + start / sample_rate, (end - start) / sample_rate) for start, end in regions]
+    return speech, spans
+
+
+def remap_segments(segments, timeline):
+    """Rewrite segment (and word) times from concatenated to original time"""
+    for segment in segments:
+        segment["start"] = timeline.to_original(segment["start"])
+        segment["end"] = timeline.to_original(segment["end"], end=True)
+        for word in segment.get("words", []):
+            word["start"] = timeline.to_original(word["start"])
+            word["end"] = timeline.to_original(word["end"], end=True)
+    return segments
+
+
+def format_speedup(audio_seconds, speech_seconds):
+    """Human readable summary of how much audio VAD removed"""
+    if not audio_seconds:
+        return "VAD: no audio"
+    skipped = 1 - speech_seconds / audio_seconds
+    ratio = audio_seconds / speech_seconds if speech_seconds else float("inf")
+    return f"VAD skipped {skipped:.0%} silence ({ratio:.2f}x less audio)"